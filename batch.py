@@ -0,0 +1,96 @@
+import globalvars as gb                 # global variables
+import simulation as sim                # the simulation module
+from ensemble import runReplicate       # runs a single simulation and returns its plots
+from sweep import pointSettings         # turns preventative measure levels into simulation settings
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor    # runs scenarios across a pool of worker processes
+
+
+plotnames = ["susceptible", "infected", "recovered", "deaths", "new cases"]    # names of the plots in the order simulations store them
+
+
+def loadScenarios(filename, locations, diseases):
+    # reads a .sim file and returns its capacity, seed and a list of (location, disease) pairs for every selected combination
+    with open(filename) as f:
+        data = json.load(f)
+
+    missing = [n for n in data["locations"] if n != "None" and n not in locations] + [n for n in data["diseases"] if n != "None" and n not in diseases]
+    if missing:
+        raise KeyError(f"{filename}: unknown location or disease {', '.join(missing)}")
+
+    locs = [locations[n] for n in dict.fromkeys(data["locations"]) if n != "None"]     # removes duplicates and unselected slots
+    dises = [diseases[n] for n in dict.fromkeys(data["diseases"]) if n != "None"]
+    return int(data["simulation capacity"]), data.get("seed"), list(itertools.product(locs, dises))
+
+
+def writeResults(plots, path, fileformat, seed):
+    # writes the plots of one scenario to a csv or npz file, npz files also store the seed the scenario was ran with
+    # the seed is stored as a string as seeds chosen by numpy are too large for an integer array
+    if fileformat == "csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestep"] + plotnames)
+            for t, row in enumerate(plots.T):
+                writer.writerow([t] + row.tolist())
+    else:
+        np.savez(path, timesteps=np.arange(plots.shape[1]), susceptible=plots[0], infected=plots[1], recovered=plots[2], deaths=plots[3], new=plots[4],
+                 seed=np.array(str(seed)))
+
+
+def runBatch(filenames, steps, outfolder, fileformat="csv", engine=None, seed=None, settings=None, workers=None):
+    # runs every scenario in the given .sim files for a number of steps and writes each one's plots to the output folder
+    # the seed of each scenario is printed with its file so unseeded runs can be repeated, returns the list of files written
+    locations = gb.loadLocations()
+    diseases = gb.loadDiseases()
+    os.makedirs(outfolder, exist_ok=True)
+
+    jobs, outputs = [], []
+    for filename in filenames:
+        capacity, fileseed, scenarios = loadScenarios(filename, locations, diseases)
+        runseed = seed if seed is not None else fileseed
+        if runseed is None:
+            runseed = np.random.SeedSequence().entropy     # scenarios without a seed are given one so the run is recorded
+        simname = os.path.splitext(os.path.basename(filename))[0]
+        for location, disease in scenarios:
+            jobs.append((location, disease, steps, runseed, 0, engine or gb.simEngine, settings or {}, capacity))
+            outputs.append(os.path.join(outfolder, f"{simname}_{location.name}_{disease.name}.{fileformat}".replace(" ", "_")))
+
+    def writeAll(results):
+        for plots, job, path in zip(results, jobs, outputs):
+            writeResults(plots, path, fileformat, job[3])
+            print(f"Wrote {path} (seed {job[3]})")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if workers == 1:
+        writeAll(map(lambda job: runReplicate(*job), jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:     # the pool is shut down even if a scenario raises an error
+            writeAll(pool.map(runReplicate, *zip(*jobs)))
+    return outputs
+
+
+def parseArgs(args=None):
+    parser = argparse.ArgumentParser(description="Runs .sim scenario files without the gui and writes the simulation plots to files.")
+    parser.add_argument("files", nargs="+", help=".sim files to run, every selected location is simulated with every selected disease")
+    parser.add_argument("-n", "--steps", type=int, default=200, help="number of timesteps to simulate (default 200)")
+    parser.add_argument("-o", "--out", default="results", help="folder the output files are written to (default 'results')")
+    parser.add_argument("-f", "--format", choices=("csv", "npz"), default="csv", help="output file format (default csv)")
+    parser.add_argument("-e", "--engine", choices=list(sim.engines), help=f"simulation engine (default {gb.simEngine})")
+    parser.add_argument("-s", "--seed", type=int, help="seed used instead of the seed in the .sim files")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes (default one per cpu)")
+    parser.add_argument("--vaccinated", type=float, default=0, help="vaccinated percentage as a decimal")
+    parser.add_argument("--quarantine", type=float, help="quarantine level, quarantine is not used if not given")
+    parser.add_argument("--lockdown", type=float, help="lockdown intensity, lockdowns are not used if not given")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parseArgs()
+    settings = pointSettings(args.vaccinated, args.quarantine, args.lockdown)
+    runBatch(args.files, args.steps, args.out, args.format, engine=args.engine, seed=args.seed, settings=settings, workers=args.workers)
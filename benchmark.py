@@ -0,0 +1,148 @@
+import globalvars as gb             # global variables
+import simulation as sim            # the simulation engines
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+
+measures = ["init", "step"] + sim.PhaseTimer.phases + ["graphplots", "run"]    # timings stored for every benchmark, in seconds
+
+
+def pickLocations(locations, count=2, population=max(gb.simCapacities)):
+    # returns the densest and sparsest countries with a population over every capacity, so every capacity limits the individuals
+    large = sorted((loc for loc in locations.values() if loc.pop >= population), key=lambda loc: loc.density)
+    return large[:count] + large[-count:]
+
+
+def getMachine():
+    # returns a dictionary describing the machine and packages the benchmarks were run with
+    return {"platform": platform.platform(), "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "numpy": np.__version__, "kernels": sim.loadKernels() is not None}
+
+
+def benchmark(location, disease, engine, capacity, steps=200, seed=0, repeats=3):
+    # times initialising a simulation, each phase of a timestep, getting the graph plots and a full run of the simulation
+    # returns a dictionary of the timings in seconds, the fastest of repeats runs with the per step timings averaged over the run
+    # the memory budget never switches the engine, so the timings are always of the engine asked for, and MemoryBudgetError is raised instead
+    gb.simCapacity = capacity
+    simulation = sim.createSimulation(location, disease, engine=engine, seed=seed, fallback=False)
+    result = {"engine": engine, "location": location.name, "capacity": capacity, "individuals": simulation.individuals,
+              "gridwidth": simulation.gridwidth}
+
+    inits = []
+    for i in range(repeats):           # the fastest of several initialisations is kept, as the first is slowed by warming up
+        start = time.perf_counter()
+        simulation.resetSim()
+        inits.append(time.perf_counter() - start)
+    result["init"] = min(inits)
+
+    runs = []
+    for i in range(repeats):           # the fastest run is kept, as other processes on the machine only ever slow a run down
+        simulation.resetSim()
+        start = time.perf_counter()
+        for t in range(steps):
+            simulation.nextTimestep()
+        runs.append(time.perf_counter() - start)
+    result["run"] = min(runs)
+    result["step"] = result["run"] / steps
+
+    graphplots = []
+    for i in range(repeats * 100):     # getting the plots is quick, so it is repeated more to be measurable
+        start = time.perf_counter()
+        simulation.getGraphPlots(steps)
+        graphplots.append(time.perf_counter() - start)
+    result["graphplots"] = min(graphplots)
+
+    # the phases are timed on separate runs of the same seed, so the timers do not slow the runs timed above
+    simulation.setTimers(True)
+    result.update(dict.fromkeys(sim.PhaseTimer.phases, float("inf")))
+    for i in range(repeats):
+        simulation.resetSim()
+        for t in range(steps):
+            simulation.nextTimestep()
+        means = simulation.timer.getTimes()[:, 1:].mean(axis=1)     # timestep 0 is not calculated so has no timings
+        for phase, mean in zip(sim.PhaseTimer.phases, means):
+            result[phase] = min(result[phase], float(mean))
+    return result
+
+
+def runBenchmarks(locations, disease, engines, capacities, steps=200, seed=0, repeats=3):
+    # runs the benchmarks of every engine on every location at every capacity, and returns them with the machine details
+    results = []
+    for engine in engines:
+        for location in locations:
+            for capacity in capacities:
+                try:
+                    result = benchmark(location, disease, engine, capacity, steps, seed, repeats)
+                except sim.MemoryBudgetError:
+                    print(f"{engine:12} {location.name:12} {capacity:8} skipped, over the {gb.simMemoryBudget} MB memory budget")
+                    continue
+                results.append(result)
+                print(f"{engine:12} {location.name:12} {capacity:8} {result['init'] * 1000:9.2f} ms init {result['step'] * 1000:9.2f} ms/step "
+                      f"{result['run']:8.2f} s run")
+    return {"machine": getMachine(), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "steps": steps, "seed": seed,
+            "repeats": repeats, "disease": disease.name, "results": results}
+
+
+def compareBenchmarks(baseline, current, threshold=0.25, floor=0.0005):
+    # compares the timings of two benchmark runs, returning a list of the timings more than threshold slower than the baseline
+    # differences under floor seconds are ignored as they are too small to measure reliably
+    problems = []
+    if baseline["machine"] != current["machine"]:
+        print("Warning: the benchmarks were run on different machines or packages")
+    before = {(r["engine"], r["location"], r["capacity"]): r for r in baseline["results"]}
+    for result in current["results"]:
+        key = (result["engine"], result["location"], result["capacity"])
+        if key not in before:
+            continue
+        for measure in measures:
+            if measure not in before[key] or measure not in result:
+                continue                            # timings added since the baseline was saved are not compared
+            old, new = before[key][measure], result[measure]
+            if new > old * (1 + threshold) and new - old > floor:
+                problems.append(f"{measure} of {' '.join(map(str, key))} took {new * 1000:.2f} ms, up from {old * 1000:.2f} ms")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the simulation engines at every simulation capacity on dense and sparse countries.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="runs the benchmarks and writes them to a json file")
+    run.add_argument("-o", "--out", default="benchmark.json", help="json file the results are written to (default benchmark.json)")
+    run.add_argument("-e", "--engines", nargs="+", choices=list(sim.engines), default=list(sim.engines), help="engines benchmarked (default all)")
+    run.add_argument("-c", "--capacities", nargs="+", type=int, default=gb.simCapacities, help="simulation capacities benchmarked (default all)")
+    run.add_argument("-l", "--locations", nargs="+", help="locations benchmarked (default the two densest and two sparsest countries)")
+    run.add_argument("-d", "--disease", default="COVID-19", help="disease simulated (default COVID-19)")
+    run.add_argument("-n", "--steps", type=int, default=200, help="number of timesteps in each run (default 200)")
+    run.add_argument("-s", "--seed", type=int, default=0, help="seed of every simulation (default 0)")
+    run.add_argument("-r", "--repeats", type=int, default=3, help="number of runs the fastest timings are kept from (default 3)")
+
+    compare = commands.add_parser("compare", help="compares benchmark results with a baseline and fails on regressions")
+    compare.add_argument("baseline", help="json file of the baseline results")
+    compare.add_argument("current", help="json file of the results checked")
+    compare.add_argument("-t", "--threshold", type=float, default=0.25, help="largest allowed slowdown as a decimal (default 0.25)")
+    compare.add_argument("-f", "--floor", type=float, default=0.0005, help="slowdowns under this many seconds are ignored (default 0.0005)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        locations = gb.loadLocations()
+        chosen = [locations[name] for name in args.locations] if args.locations else pickLocations(locations)
+        results = runBenchmarks(chosen, gb.loadDiseases()[args.disease], args.engines, args.capacities, args.steps, args.seed, args.repeats)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+        print("Wrote " + args.out)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        problems = compareBenchmarks(baseline, current, args.threshold, args.floor)
+        for problem in problems:
+            print("FAIL: " + problem)
+        sys.exit(1 if problems else 0)
@@ -0,0 +1,60 @@
+import globalvars as gb     # global variables
+import simulation as sim    # the simulation module
+
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor    # runs replicates across a pool of worker processes
+
+
+class EnsembleResult:
+
+    def __init__(self, runs, seed, percentiles):
+        self.runs = runs              # array of every replicate's plots, shape (replicates, 5, timesteps + 1)
+        self.seed = seed              # seed the replicates were created from, so the ensemble can be reproduced
+        self.mean = runs.mean(axis=0)                  # mean of each plot at every timestep, shape (5, timesteps + 1)
+        self.percentiles = {}                          # dictionary of percentile plots, percentiles[p] has the same shape as the mean
+        for p, values in zip(percentiles, np.percentile(runs, percentiles, axis=0)):
+            self.percentiles[p] = values
+
+    def getPlot(self, index, p=None):
+        # returns the mean of a plot (0=sus, 1=inf, 2=rec, 3=mor, 4=new), or the given percentile of it
+        if p is None:
+            return self.mean[index]
+        return self.percentiles[p][index]
+
+
+def runReplicate(country, disease, timesteps, seed, replicate, engine, settings, capacity):
+    # runs one replicate of a scenario and returns its plots as an array, used by the worker processes
+    gb.simCapacity = capacity                  # worker processes do not share the global variables of the main process
+    # the preventative measures and starting infected are set before the simulation is initialised, so it is only initialised once
+    simulation = sim.createSimulation(country, disease, engine, seed=seed, replicate=replicate, settings=settings)
+    simulation.runSimulation(timesteps)
+    return simulation.history.getPlots().copy()
+
+
+def runEnsemble(country, disease, timesteps, replicates=20, settings=None, engine=None, seed=None, percentiles=(5, 50, 95), workers=None):
+    # runs a number of replicates of the same scenario on a process pool and returns an EnsembleResult
+    # settings is a dictionary of simulation attributes, e.g. {"vaccinated_perc": 0.5, "usequarantine": True}
+    if seed is None:
+        seed = np.random.SeedSequence().entropy     # a seed is chosen so every replicate is different but the ensemble can be repeated
+    settings = settings or {}
+    engine = engine or gb.simEngine
+    workers = min(workers or os.cpu_count() or 1, replicates)
+
+    args = [(country, disease, timesteps, seed, r, engine, settings, gb.simCapacity) for r in range(replicates)]
+    if workers == 1:
+        runs = [runReplicate(*a) for a in args]      # a single worker is ran in this process to avoid the pool start up cost
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(runReplicate, *zip(*args), chunksize=max(1, replicates // (workers * 4))))
+
+    return EnsembleResult(np.array(runs), seed, percentiles)
+
+
+if __name__ == "__main__":
+    # runs an example ensemble when 'ensemble.py' is ran by itself
+    country = gb.Country(["Country", "Null", "None", 10000, 100, 10])
+    disease = gb.Disease(["COVID-19", 2.8, 0.006, 5, 9, 1, 0, "No Information", "No Information"])
+    result = runEnsemble(country, disease, 100, replicates=20, seed=1)
+    print("Mean peak infected: " + str(int(result.getPlot(1).max())))
+    print("5th-95th percentile total deaths: " + str(result.getPlot(3, 5)[-1]) + "-" + str(result.getPlot(3, 95)[-1]))
@@ -0,0 +1,128 @@
+import globalvars as gb             # global variables
+import simulation as sim            # the simulation engines
+from ensemble import runEnsemble    # runs replicates of a scenario on a process pool
+
+import argparse
+import sys
+import numpy as np
+
+
+# scenarios every engine is compared on, as (country, disease, settings, simulation capacity); a dense and a sparse location
+# with and without preventative measures, measures strong enough to hold the epidemic near its threshold, where small differences
+# between the engines' models decide whether it grows, and a real country over the capacity, which the object and array engines
+# scale down to the capacity
+# the threshold scenario starts with 100 infected so it is not decided by whether the first few die out, and its disease is
+# deadlier because quarantine removes most infected before they can die, which would leave too few deaths to compare
+disease = gb.Disease(["COVID-19", 2.8, 0.006, 5, 9, 1, 0, "No Information", "No Information"])
+deadly = gb.Disease(["Deadly COVID-19", 2.8, 0.2, 5, 9, 1, 0, "No Information", "No Information"])
+dense = gb.Country(["Dense", "Null", "None", 10000, 100, 10])
+sparse = gb.Country(["Sparse", "Null", "None", 10000, 2500, 1])
+estonia = gb.loadLocations()["Estonia"]
+quarantine = {"usequarantine": True, "quarantine_lvl": 0.1}
+lockdown = {"uselockdown": True, "lockdown_intensity": 0.3}
+threshold = {"usequarantine": True, "quarantine_lvl": 0.3, "uselockdown": True, "lockdown_intensity": 0.1, "startinf": 100}
+scenarios = {"dense": (dense, disease, {}, 10000), "sparse": (sparse, disease, {}, 10000),
+             "dense quarantine": (dense, disease, quarantine, 10000), "sparse lockdown": (sparse, disease, lockdown, 10000),
+             "dense threshold": (dense, deadly, threshold, 10000), "estonia over capacity": (estonia, disease, {}, 10000)}
+
+# replicates of a scenario are multiplied by these for the scenarios that vary the most between replicates: lockdowns and
+# epidemics held near their threshold decide when and how far they spread, and the epidemic over capacity spreads slowly from
+# few starting infected; with 30 replicates 2 standard errors of their attack rate or timings alone are about their tolerance
+replicatescale = {"sparse lockdown": 3, "dense threshold": 3, "estonia over capacity": 3}
+
+# engines not compared on a scenario on purpose, as their model differs from the reference's there; the compartment engine
+# simulates the whole population of a location over the capacity rather than scaling it down, so its epidemic spreads over
+# a population and area hundreds of times larger
+notcompared = {"estonia over capacity": ["compartment"]}
+
+# largest allowed difference of each measure from the reference engine, relative to the reference for proportions of the population
+# and in timesteps for the timings; the difference checked includes 2 standard errors, so each tolerance is the systematic
+# difference allowed plus the noise of 30 replicates; two object ensembles of different seeds differ by up to 0.06 in the peak,
+# 0.02 in the attack rate and 1 timestep in the timings once the standard errors are added, but deaths are ~60 on a population
+# of 10000 so 2 standard errors of their difference alone are 0.07-0.10, leaving about 0.1 of systematic difference in deaths
+tolerances = {"peak infected": (0.1, True), "peak timestep": (3.5, False), "attack rate": (0.02, True),
+              "deaths": (0.2, True), "death timestep": (3, False)}
+
+
+def getMetrics(runs):
+    # takes the plots of every replicate, shape (replicates, 5, timesteps + 1), and returns a dictionary of the compared measures
+    # as fractions of the simulated population so engines simulating different numbers of individuals can be compared
+    # the death curve is compared by its final value and the mean timestep of a death, so a curve shifted by a timestep still matches
+    population = runs[:, :4, 0].sum(axis=1)                         # susceptible + infected + recovered + dead at timestep 0
+    daily = np.diff(runs[:, 3], axis=1)                             # deaths on each timestep
+    return {"peak infected": runs[:, 1].max(axis=1) / population,
+            "peak timestep": runs[:, 1].argmax(axis=1).astype(float),
+            "attack rate": 1 - runs[:, 0, -1] / population,         # proportion of the population ever infected
+            "deaths": runs[:, 3, -1] / population,
+            "death timestep": (daily * np.arange(1, runs.shape[2])).sum(axis=1) / np.maximum(daily.sum(axis=1), 1)}
+
+
+def compareMetric(reference, values, relative=True, z=2):
+    # returns the reference mean, the mean and their difference, relative to the reference mean if relative, with z standard errors
+    # of the difference added, so a measure only passes when the difference is small and enough replicates were run to show it
+    refmean, mean = reference.mean(), values.mean()
+    difference = abs(mean - refmean) + z * np.sqrt(reference.var(ddof=1) / len(reference) + values.var(ddof=1) / len(values))
+    return refmean, mean, difference / max(abs(refmean), 1e-12) if relative else difference
+
+
+def compareEngines(country, disease, timesteps=120, engines=None, reference="object", replicates=30, settings=None, capacity=None,
+                   seed=0, scale=1, workers=None):
+    # runs an ensemble of the scenario on the reference engine and each other engine at the simulation capacity, and compares their measures
+    # returns a list of (engine, measure, reference value, value, difference, passed) rows, tolerances are multiplied by scale
+    engines = engines or [name for name in sim.engines if name != reference]
+    results = {}
+    oldcapacity, gb.simCapacity = gb.simCapacity, capacity or gb.simCapacity
+    try:
+        for engine in [reference] + list(engines):
+            ensemble = runEnsemble(country, disease, timesteps, replicates=replicates, settings=settings, engine=engine, seed=seed, workers=workers)
+            results[engine] = getMetrics(ensemble.runs)
+    finally:
+        gb.simCapacity = oldcapacity
+
+    rows = []
+    for engine in engines:
+        for measure, values in results[engine].items():
+            tolerance, relative = tolerances[measure]
+            refvalue, value, difference = compareMetric(results[reference][measure], values, relative)
+            rows.append((engine, measure, refvalue, value, difference, difference <= tolerance * scale))
+    return rows
+
+
+def checkEquivalence(timesteps=120, engines=None, reference="object", replicates=30, seed=0, scale=1, workers=None):
+    # compares every engine with the reference engine on every scenario and prints the results
+    # returns a list of the measures that are not within the tolerance, which is empty when every engine passes
+    problems = []
+    engines = engines or [name for name in sim.engines if name != reference]
+    for name, (country, disease, settings, capacity) in scenarios.items():
+        print(f"{name}:")
+        compared = [engine for engine in engines if engine not in notcompared.get(name, [])]
+        for engine in engines:
+            if engine not in compared:
+                print(f"  {engine:12} not compared, its model differs from {reference} here")
+        if not compared:
+            continue
+        for engine, measure, refvalue, value, difference, passed in compareEngines(country, disease, timesteps, compared, reference,
+                                                                                  replicates * replicatescale.get(name, 1), settings,
+                                                                                  capacity, seed, scale, workers):
+            shown = f"{difference * 100:6.1f}%" if tolerances[measure][1] else f"{difference:7.2f}"
+            print(f"  {engine:12} {measure:15} {refvalue:8.4f} {value:8.4f} {shown}  {'ok' if passed else 'FAIL'}")
+            if not passed:
+                problems.append(f"{engine} {measure} on {name} differs from {reference} by up to {shown.strip()}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the simulation engines simulate the same epidemics as the reference engine.")
+    parser.add_argument("-e", "--engines", nargs="+", choices=list(sim.engines), help="engines compared (default every engine but the reference)")
+    parser.add_argument("--reference", choices=list(sim.engines), default="object", help="engine the others are compared with (default object)")
+    parser.add_argument("-n", "--steps", type=int, default=120, help="number of timesteps simulated (default 120)")
+    parser.add_argument("-r", "--replicates", type=int, default=30, help="number of replicates of each scenario (default 30)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed the replicates are created from (default 0)")
+    parser.add_argument("-t", "--tolerance", type=float, default=1, help="multiplies the allowed difference of every measure (default 1)")
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes (default one per cpu)")
+    args = parser.parse_args()
+
+    problems = checkEquivalence(args.steps, args.engines, args.reference, args.replicates, args.seed, args.tolerance, args.workers)
+    for problem in problems:
+        print("FAIL: " + problem)
+    sys.exit(1 if problems else 0)
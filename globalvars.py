@@ -1,3 +1,7 @@
+import csv
+import os
+
+
 # APPLICATION VARIABLES
 WIDTH, HEIGHT = 1000, 600
 bgcol = "white"
@@ -49,6 +53,22 @@ class Disease():
         self.dpercent = str(round(self.drate*100, 4)) + "%"
 
 
+def loadLocations(folder=os.path.dirname(os.path.abspath(__file__))):
+    # returns a dictionary of every country and custom location object by name, read from the csv files in the given folder
+    locations = {}
+    for filename in ("countries.csv", "customlocs.csv"):
+        with open(os.path.join(folder, filename), "r") as f:
+            for row in csv.reader(f, delimiter=','):
+                locations[row[0]] = Country(row)
+    return locations
+
+
+def loadDiseases(folder=os.path.dirname(os.path.abspath(__file__))):
+    # returns a dictionary of every disease object by name, read from the csv file in the given folder
+    with open(os.path.join(folder, "diseases.csv"), "r") as f:
+        return {row[0]: Disease(row) for row in csv.reader(f, delimiter=',')}
+
+
 # SIMULATION PARAMETERS
 simEditing = 1           # 1 edits the first, 2 edits the second variable
 simLocation1 = None
@@ -57,5 +77,11 @@ simDisease1 = None
 simDisease2 = None
 
 simCapacity = 50000      # limits the number of individuals simulated
+simCapacities = [1000, 5000, 10000, 25000, 50000, 75000, 100000, 250000, 500000, 1000000]   # capacities that can be chosen
+simEngine = "object"     # name of the engine used to run simulations
+simSeed = None           # seed used to make simulations reproducible, None gives a new random run every time
+simMemoryBudget = 1024   # largest memory in MB a simulation can be estimated to use before it is refused, None turns the check off
+simMemoryFallback = True # simulations over the memory budget use a leaner engine that is within it instead of being refused
+simLookahead = 20        # number of timesteps calculated ahead of the shown timestep while a simulation is paused, 0 turns it off
 
 return_frame = None      # stores the frame to return to when going back
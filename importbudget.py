@@ -0,0 +1,53 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+folder = os.path.dirname(os.path.abspath(__file__))     # folder the simulation modules are in
+headless = ["simulation", "ensemble", "sweep", "batch"]  # modules used by worker processes and the batch runner
+forbidden = ["tkinter", "matplotlib"]                    # packages the headless modules must never import
+
+
+def measureImport(module):
+    # imports a module in a new python process and returns its cumulative import time in seconds and the list of loaded modules
+    code = f"import sys, {module}; print(','.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=folder, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = line.split("|")                     # lines are "import time: self | cumulative | name"
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6, result.stdout.strip().split(",")
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def checkImports(budget=0.3, runs=5):
+    # checks every headless module imports within the time budget (median of several runs) without any forbidden packages
+    # returns a list of the problems found, which is empty when every module passes
+    problems = []
+    for module in headless:
+        times = []
+        for i in range(runs):
+            seconds, loaded = measureImport(module)
+            times.append(seconds)
+        median = statistics.median(times)
+        print(f"{module:12} {median * 1000:7.1f} ms")
+
+        if median > budget:
+            problems.append(f"{module} took {median * 1000:.1f} ms to import, over the {budget * 1000:.0f} ms budget")
+        for package in forbidden:
+            if package in loaded:
+                problems.append(f"{module} imports {package}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the simulation modules import quickly and without the gui or plotting packages.")
+    parser.add_argument("-b", "--budget", type=float, default=0.3, help="largest allowed import time of each module in seconds (default 0.3)")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="number of imports measured for each module (default 5)")
+    args = parser.parse_args()
+
+    problems = checkImports(args.budget, args.runs)
+    for problem in problems:
+        print("FAIL: " + problem)
+    sys.exit(1 if problems else 0)
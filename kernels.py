@@ -0,0 +1,123 @@
+import numba                # optional, the array engine uses these kernels when numba is installed and numpy operations otherwise
+import numpy as np
+
+
+# compiled loops over the population arrays of ArraySimulation, each phase goes through the population once without the temporary
+# arrays the numpy operations make; random numbers are drawn by the simulation and passed in, in the same order and amounts
+# as the numpy path draws them, so both backends give the same results for the same seed
+# the kernels release the GIL, so the two simulations of a page are stepped at the same time on the step pool
+# states match the constants in simulation.py: 0 susceptible, 1 infected, 2 recovered, 3 dead
+
+
+@numba.njit(cache=True, nogil=True)
+def infectionPressure(row, col, state, gridwidth):
+    # returns the number of infected on each location, and the number of susceptible individuals sharing a location with an infected
+    infcount = np.zeros(gridwidth * gridwidth, dtype=np.int64)
+    for i in range(state.size):
+        if state[i] == 1:
+            infcount[row[i] * gridwidth + col[i]] += 1
+    exposed = 0
+    for i in range(state.size):
+        if state[i] == 0 and infcount[row[i] * gridwidth + col[i]] > 0:
+            exposed += 1
+    return infcount, exposed
+
+
+@numba.njit(cache=True, nogil=True)
+def infect(row, col, state, infectedat, infcount, gridwidth, inf_chance, uniforms, timestep):
+    # infects exposed susceptible individuals with one uniform number each, returns the number of new cases
+    k = 0
+    newcases = 0
+    for i in range(state.size):
+        if state[i] == 0:
+            infected = infcount[row[i] * gridwidth + col[i]]
+            if infected > 0:
+                if uniforms[k] < inf_chance * infected:    # chance of getting infected increased based on number of infected on the location
+                    state[i] = 1
+                    infectedat[i] = timestep
+                    newcases += 1
+                k += 1
+    return newcases
+
+
+@numba.njit(cache=True, nogil=True)
+def quarantine(state, uniforms, quarantine_lvl):
+    # removes infected individuals as recovered with one uniform number each, returns the number still infected
+    k = 0
+    remaining = 0
+    for i in range(state.size):
+        if state[i] == 1:
+            if uniforms[k] < quarantine_lvl:
+                state[i] = 2
+            else:
+                remaining += 1
+            k += 1
+    return remaining
+
+
+@numba.njit(cache=True, nogil=True)
+def recover(state, infectedat, uniforms, recovery_table, infectious, timestep, recovered):
+    # finds the infected individuals that recover with one uniform number each, writing their indexes to recovered
+    # returns the number found, they are left infected until their deaths are decided
+    k = 0
+    count = 0
+    for i in range(state.size):
+        if state[i] == 1:
+            relative = timestep - infectedat[i] - infectious        # infection length relative to the mean length
+            if relative < -10:
+                chance = 0.0                                        # lengths far before the mean never recover
+            elif relative > 10:
+                chance = 1.0                                        # and lengths far past the mean always recover
+            else:
+                chance = recovery_table[relative + 10]
+            if uniforms[k] < chance:
+                recovered[count] = i
+                count += 1
+            k += 1
+    return count
+
+
+@numba.njit(cache=True, nogil=True)
+def die(state, recovered, uniforms, deathchance):
+    # moves the recovered individuals to deaths or recovered with one uniform number each
+    for k in range(recovered.size):
+        if uniforms[k] < deathchance:
+            state[recovered[k]] = 3
+        else:
+            state[recovered[k]] = 2
+
+
+@numba.njit(cache=True, nogil=True)
+def chooseMovers(state, infectedat, uniforms, movechance, infectedchance, incubation, timestep, movers):
+    # decides which susceptible and infected individuals move with one uniform number each, writing their indexes to movers
+    # infected individuals past their incubation period move with the infected chance, returns the number of movers
+    k = 0
+    count = 0
+    for i in range(state.size):
+        if state[i] <= 1:
+            chance = movechance
+            if state[i] == 1 and timestep - infectedat[i] > incubation:
+                chance = infectedchance
+            if uniforms[k] < chance:
+                movers[count] = i
+                count += 1
+            k += 1
+    return count
+
+
+@numba.njit(cache=True, nogil=True)
+def move(row, col, movers, axes, normals, gridwidth):
+    # moves each mover along its axis (0 for rows) towards the centre of the grid, with a Normal distance of standard deviation 100
+    for k in range(movers.size):
+        i = movers[k]
+        pos = row[i] if axes[k] == 0 else col[i]
+        mean = (gridwidth / 2) - pos
+        dist = mean + 100 * normals[k]
+        new = dist + pos
+        if new >= gridwidth or new <= 0:
+            dist = mean                         # distances that leave the grid are set to the mean
+        pos = pos + int(dist)                   # travelled distance is added to the position, truncated like int()
+        if axes[k] == 0:
+            row[i] = pos
+        else:
+            col[i] = pos
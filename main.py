@@ -1,14 +1,19 @@
 import worldmap as wm         # world map page
 import diseaseselect as ds    # disease selection page
 import globalvars as gb       # global variables
-import simulation as sim      # the simulation modules
+import simulation as sim      # the simulation engines
+import simfigure as sf        # the simulation graphs
+import tracing                # records trace events when tracing is turned on
 
 import tkinter as tk          # tkinter used for gui
 from tkinter import ttk       # ttk used for more widgets on gui
+from tkinter import messagebox    # warns when a simulation is over the memory budget
 
 import threading              # threads used in simulation
-import time                   # used to vary simulation speeds
+import argparse               # reads the command line options
+import queue                  # passes calculated timesteps from the simulation thread to the gui
 import json                   # json module used to load and save settings
+from concurrent.futures import ThreadPoolExecutor    # steps the two simulations of a page at the same time
 
 from math import log
 
@@ -142,7 +147,7 @@ class App(tk.Tk):
         simcap = gb.simCapacity
 
         # dictionary object to be used to create json file
-        data = {"simulation capacity": simcap, "locations": locations, "diseases": diseases}
+        data = {"simulation capacity": simcap, "locations": locations, "diseases": diseases, "seed": gb.simSeed}
 
         with open(self.loadedfile, "w") as f:       # opens the loaded file
             json.dump(data, f, indent=4)            # the dictionary is loaded into the file as json
@@ -175,6 +180,7 @@ class App(tk.Tk):
 
         simcap = data["simulation capacity"]
         gb.simCapacity = int(simcap)
+        gb.simSeed = data.get("seed")                               # older files without a seed give random runs
         locations = data["locations"]                               # assigns the locations from the file to the global variables file
         gb.simLocation1 = self.getLocationByName(locations[0])      # gets the location object from the name
         gb.simLocation2 = self.getLocationByName(locations[1])      #
@@ -292,6 +298,7 @@ class SettingsPage(ttk.Frame):
         self.loctwo = tk.StringVar(value="None Selected")
         self.disone = tk.StringVar(value="None Selected")
         self.distwo = tk.StringVar(value="None Selected")
+        self.seed = tk.StringVar()           # string variable storing the simulation seed
 
         locdis = ttk.Label(self)    # frame for location and disease selection
         ttk.Label(locdis, text="Location Variables:", font=gb.BIGFONT).grid(row=0, column=0, columnspan=2, sticky="w")
@@ -316,12 +323,29 @@ class SettingsPage(ttk.Frame):
         # frame for controlling the simulation capacity
         simcapframe = ttk.Frame(self)
         ttk.Label(simcapframe, text="Simulation Capacity:", font=gb.BIGFONT).pack()
-        self.simcapvalues = [1000, 5000, 10000, 25000, 50000, 75000, 100000, 250000, 500000, 1000000]
+        self.simcapvalues = gb.simCapacities
         self.simcap = tk.Scale(simcapframe, from_=min(self.simcapvalues), to=max(self.simcapvalues), command=self.simcapacitycallback, orient="horizontal")
         self.simcap.set(gb.simCapacity)
         self.simcap.pack()
         simcapframe.pack(pady=10)
 
+        # frame for selecting the simulation engine
+        engineframe = ttk.Frame(self)
+        ttk.Label(engineframe, text="Simulation Engine:", font=gb.BIGFONT).pack()
+        self.engine = tk.StringVar(value=gb.simEngine)
+        self.engine.trace("w", self.enginecallback)
+        ttk.Combobox(engineframe, textvar=self.engine, values=list(sim.engines), state="readonly", width=12).pack()
+        self.enginenote = tk.StringVar(value=self.engineNote(gb.simEngine))     # warns when the engine ignores the simulation capacity
+        ttk.Label(engineframe, textvar=self.enginenote, wraplength=300, justify="center").pack()
+        engineframe.pack(pady=10)
+
+        # frame for entering the seed, left empty for random runs
+        seedframe = ttk.Frame(self)
+        ttk.Label(seedframe, text="Simulation Seed:", font=gb.BIGFONT).pack()
+        self.seed.trace("w", self.seedcallback)
+        ttk.Entry(seedframe, textvar=self.seed, width=14).pack()
+        seedframe.pack(pady=10)
+
         tk.Button(self, text="Back", command=lambda: app.showPage(MainPage)).pack()
 
         self.bind("<Expose>", self.updateGlobalVars)      # when the settings page is opened the variables are updated
@@ -332,6 +356,27 @@ class SettingsPage(ttk.Frame):
         self.simcap.set(newvalue)
         gb.simCapacity = newvalue
 
+    def enginecallback(self, *args):
+        # sets the simulation engine to the one selected in the combobox
+        gb.simEngine = self.engine.get()
+        self.enginenote.set(self.engineNote(gb.simEngine))
+
+    @staticmethod
+    def engineNote(engine):
+        # returns the note shown for an engine that simulates the whole population, empty for the others
+        if sim.engines[engine].fullpopulation:
+            return "Simulates the whole population, so results of locations over the capacity differ from the other engines."
+        return ""
+
+    def seedcallback(self, *args):
+        # makes sure the seed entry is only digits and sets the simulation seed, an empty entry means no seed
+        # entries with anything but digits, typed or pasted, are put back to the current seed
+        seed = self.seed.get()
+        if seed and not seed.isdecimal():
+            self.seed.set("" if gb.simSeed is None else gb.simSeed)
+        else:
+            gb.simSeed = int(seed) if seed else None
+
     def updateGlobalVars(self, *args):
         # checks for the existence of loaction/disease objects and sets the names to the correct label on the settings page
         if c := gb.simLocation1:
@@ -354,6 +399,9 @@ class SettingsPage(ttk.Frame):
         else:
             self.distwo.set(self.deafulttext)
 
+        self.seed.set("" if gb.simSeed is None else gb.simSeed)    # shows the seed, which may have been loaded from a file
+        self.engine.set(gb.simEngine)    # shows the engine, which may have been changed to fit the memory budget
+
         self.app.update_idletasks()
 
     def editVar(self, num=1, loc=False):
@@ -371,22 +419,39 @@ class SimulationPage(ttk.Frame):
         ttk.Frame.__init__(self, parent)  # initializes the tkinter frame class
         self.app = app                    # main app object
 
-        self.bind("<Expose>", self.updateVars)   # calls updateVars everytime the page is openened
+        self.bind("<Expose>", self.pageOpened)   # calls updateVars everytime the page is openened
 
         self.simRunning = False     # boolean for if sim is currently running
         self.scale = False          # boolean for if graphs should be scaled
-        self.loadedTime = 0         # int for how many timesteps have been loaded
+        self.loadedTime = 0         # int for the latest timestep calculated by the simulation thread
         self.currentTime = 0        # int for currently displayed timestep
 
-        # allows secondary thread to be used for simulation as tkinter gui updates can only happen on the main thread,
-        self.setToDraw = tk.IntVar()                      # tkinter int var can be edited on secondary thread, then whenever
-        self.setToDraw.trace("w", self.drawAllCanvas)     # it is edited the graphs are promted to update on the main thread
-
-        self.simulationOne = sim.Simulation(gb.simLocation1, gb.simDisease1)   # stores simulation objects
-        self.simulationTwo = sim.Simulation(gb.simLocation1, gb.simDisease2)
-
-        self.figureOne = sim.SimulationFigure(self, self.simulationOne)        # stores figure objects
-        self.figureTwo = sim.SimulationFigure(self, self.simulationTwo)
+        # the simulation is calculated on a secondary thread, which puts each timestep in a queue as tkinter gui updates can only
+        # happen on the main thread; the main thread checks the queue every pollinterval ms and draws all timesteps found at once
+        # only the timestep number is queued, the graphs and advanced tab read each simulation's history up to it, which the
+        # simulation thread has finished writing before putting it in the queue and only adds later timesteps to after
+        # each timestep is queued with the stop event of its run, so timesteps of a stopped run that are still queued are not shown
+        self.stepqueue = queue.Queue(maxsize=64)
+        self.pollinterval = 15
+        self.simthread = None
+        self.stopevent = threading.Event()
+
+        # while the simulation is paused, a thread calculates the timesteps after the shown timestep before they are needed,
+        # it waits for prefetchevent which is set whenever the shown timestep or the simulations change
+        self.prefetchevent = threading.Event()
+        self.steppool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="step")    # steps simulations together when their engine releases the GIL
+        prefetchthread = threading.Thread(target=self.prefetchSteps, name="prefetch")
+        prefetchthread.daemon = True
+        prefetchthread.start()
+
+        self.engine = gb.simEngine                                                    # stores the name of the engine the simulations use
+        self.simulationOne = sim.createSimulation(gb.simLocation1, gb.simDisease1)   # stores simulation objects
+        self.simulationTwo = sim.createSimulation(gb.simLocation1, gb.simDisease2)
+        self.simulationOne.setTimers(True)      # the phases of each timestep are timed for the advanced tab
+        self.simulationTwo.setTimers(True)
+
+        self.figureOne = sf.SimulationFigure(self, self.simulationOne)        # stores figure objects
+        self.figureTwo = sf.SimulationFigure(self, self.simulationTwo)
         self.canvasList = []
 
         self.simMainLabel = tk.StringVar()      # stores the name of the location/disease (depending on simulation type)
@@ -426,7 +491,7 @@ class SimulationPage(ttk.Frame):
         self.tabControl.add(tab1, text='Simulation View')
         self.tabControl.add(tab2, text='Simplified View')
         self.tabControl.add(tab3, text='Advanced View')
-        self.tabControl.bind("<<NotebookTabChanged>>", self.drawAllCanvas)
+        self.tabControl.bind("<<NotebookTabChanged>>", self.tabChanged)
 
         # initializes the layout of each tab
         self.simulationTab_init(tab1)
@@ -443,10 +508,10 @@ class SimulationPage(ttk.Frame):
         # sets the deafult layout for the simulation tab
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (4, 3.3))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (4, 3.3))
         graphOne.getCanvas().grid(row=1, column=0, columnspan=2)
         pagecanvas.append(graphOne)
-        graphTwo = sim.DrawableCanvas(graph_frame, self.figureTwo, (4, 3.3))
+        graphTwo = sf.DrawableCanvas(graph_frame, self.figureTwo, (4, 3.3))
         graphTwo.getCanvas().grid(row=1, column=2, columnspan=2)
         pagecanvas.append(graphTwo)
         self.canvasList.append(pagecanvas)
@@ -477,10 +542,10 @@ class SimulationPage(ttk.Frame):
         # sets the deafult layout for the simplified tab
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (5, 4.65))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (5, 4.65))
         graphOne.getCanvas().grid(row=1, column=0, columnspan=2)
         pagecanvas.append(graphOne)
-        graphTwo = sim.DrawableCanvas(graph_frame, self.figureTwo, (5, 4.65))
+        graphTwo = sf.DrawableCanvas(graph_frame, self.figureTwo, (5, 4.65))
         graphTwo.getCanvas().grid(row=1, column=2, columnspan=2)
         pagecanvas.append(graphTwo)
         self.canvasList.append(pagecanvas)
@@ -502,10 +567,10 @@ class SimulationPage(ttk.Frame):
         # sets the deafult layout for the advanced tab
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (3.8, 3.4))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (3.8, 3.4))
         graphOne.getCanvas().grid(row=1, column=0, columnspan=2)
         pagecanvas.append(graphOne)
-        graphTwo = sim.DrawableCanvas(graph_frame, self.figureTwo, (3.8, 3.4))
+        graphTwo = sf.DrawableCanvas(graph_frame, self.figureTwo, (3.8, 3.4))
         graphTwo.getCanvas().grid(row=1, column=2, columnspan=2, padx=15)
         pagecanvas.append(graphTwo)
         self.canvasList.append(pagecanvas)
@@ -549,6 +614,7 @@ class SimulationPage(ttk.Frame):
         ttk.Label(info_frame1, textvar=self.adv_alltime_1, font=("Verdana", 14)).grid(row=2, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_recovered_1, font=("Verdana", 14)).grid(row=3, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_deaths_1, font=("Verdana", 14)).grid(row=4, column=1, sticky="w")
+        self.adv_timers_1 = self.timerLabels(info_frame1, row=5)
         info_frame1.grid(row=2, column=0)
 
         info_frame1 = ttk.Frame(graph_frame)
@@ -567,24 +633,51 @@ class SimulationPage(ttk.Frame):
         ttk.Label(info_frame1, textvar=self.adv_alltime_2, font=("Verdana", 14)).grid(row=2, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_recovered_2, font=("Verdana", 14)).grid(row=3, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_deaths_2, font=("Verdana", 14)).grid(row=4, column=1, sticky="w")
+        self.adv_timers_2 = self.timerLabels(info_frame1, row=5)
         info_frame1.grid(row=2, column=2)
 
         self.updateAdvanced()
 
+    def timerLabels(self, frame, row):
+        # adds rows to the frame showing the timesteps calculated per second and the milliseconds taken by each phase
+        # of a timestep, starting at the given row, and returns the string variables of the values
+        timervars = []
+        names = ["Steps/sec"] + [phase.capitalize() + " ms" for phase in sim.PhaseTimer.phases]
+        for i, name in enumerate(names):
+            timervars.append(tk.StringVar())
+            ttk.Label(frame, text=name + ":", font=gb.SMLFONT).grid(row=row + i, column=0, sticky="e")
+            ttk.Label(frame, textvar=timervars[i], font=gb.SMLFONT).grid(row=row + i, column=1, sticky="w")
+        return timervars
+
+    def updateTimers(self, simulation, timervars, timestep):
+        # shows the speed of the simulation over the timesteps up to the given timestep, and the time of each phase at it
+        timer = simulation.timer
+        if timer is None or timestep < 1 or timestep >= timer.length:    # timestep 0 is not calculated so is not timed
+            for var in timervars:
+                var.set("-")
+            return
+        timervars[0].set(f"{timer.getStepRate(timestep):.1f}")
+        for var, seconds in zip(timervars[1:], timer.times[:, timestep]):
+            var.set(f"{seconds * 1000:.2f}")
+
     def updateAdvanced(self):
         # gets advanced data for both simulations and updates the string variables
         t = self.currentTime
-        self.adv_newcases_1.set(self.figureOne.simulation.newplot[t])
-        self.adv_current_1.set(self.figureOne.simulation.infplot[t])
-        self.adv_alltime_1.set(sum(self.figureOne.simulation.newplot[:t+1])+self.figureOne.simulation.infplot[0])
-        self.adv_recovered_1.set(self.figureOne.simulation.recplot[t])
-        self.adv_deaths_1.set(self.figureOne.simulation.morplot[t])
-
-        self.adv_newcases_2.set(self.figureTwo.simulation.newplot[t])
-        self.adv_current_2.set(self.figureTwo.simulation.infplot[t])
-        self.adv_alltime_2.set(sum(self.figureTwo.simulation.newplot[:t+1])+self.figureOne.simulation.infplot[0])
-        self.adv_recovered_2.set(self.figureTwo.simulation.recplot[t])
-        self.adv_deaths_2.set(self.figureTwo.simulation.morplot[t])
+        history = self.figureOne.simulation.history
+        self.adv_newcases_1.set(history.data[4, t])
+        self.adv_current_1.set(history.data[1, t])
+        self.adv_alltime_1.set(history.getTotal(4, t) + history.data[1, 0])    # running total of new cases plus the starting infected
+        self.adv_recovered_1.set(history.data[2, t])
+        self.adv_deaths_1.set(history.data[3, t])
+        self.updateTimers(self.figureOne.simulation, self.adv_timers_1, t)
+
+        history = self.figureTwo.simulation.history
+        self.adv_newcases_2.set(history.data[4, t])
+        self.adv_current_2.set(history.data[1, t])
+        self.adv_alltime_2.set(history.getTotal(4, t) + history.data[1, 0])
+        self.adv_recovered_2.set(history.data[2, t])
+        self.adv_deaths_2.set(history.data[3, t])
+        self.updateTimers(self.figureTwo.simulation, self.adv_timers_2, t)
 
     def playPauseFrame(self, frame):
         # creates a frame for controlling the playback of the simulation
@@ -669,6 +762,32 @@ class SimulationPage(ttk.Frame):
 
         simframe.grid(row=4, column=0, columnspan=4, pady=5)
 
+    def pageOpened(self, *a):
+        # updates the simulation engine and variables when the page is opened
+        if self.engine != gb.simEngine:
+            self.updateEngine()
+        else:
+            self.updateVars()
+
+    def updateEngine(self):
+        # replaces both simulations with ones using the engine selected in the settings
+        if self.simRunning:
+            self.playPauseButton()    # the simulation is paused first
+        self.engine = gb.simEngine
+        self.simulationOne = sim.createSimulation(None, None)
+        self.simulationTwo = sim.createSimulation(None, None)
+        self.simulationOne.setTimers(True)
+        self.simulationTwo.setTimers(True)
+        self.figureOne.setSim(self.simulationOne)
+        self.figureTwo.setSim(self.simulationTwo)
+
+        # the preventative measures and starting infected are copied over to the new simulations
+        self.updateStartInf()
+        self.updateVacc()
+        self.updateQuar()
+        self.updateLock()
+        self.updateVars(bypass=True)
+
     def updateVis(self, *a):
         # updates the list controlling visibility of plots on the graph when a checkbox is changed
         viewplot = [self.plotsus.get(), self.plotinf.get(), self.plotrec.get(), self.plotmor.get(), self.plotnew.get()]
@@ -715,6 +834,7 @@ class SimulationPage(ttk.Frame):
             self.vaccscale["state"] = "disabled"
         self.simulationOne.vaccinated_perc = vaccper
         self.simulationTwo.vaccinated_perc = vaccper
+        self.measuresChanged()
 
     def updateQuar(self, *a):
         # updates the quarantine level for both simulations when the checkbox/slider is changed
@@ -728,6 +848,7 @@ class SimulationPage(ttk.Frame):
             self.quarscale["state"] = "normal"
         else:
             self.quarscale["state"] = "disabled"
+        self.measuresChanged()
 
     def updateLock(self, *a):
         # updates the lockdown intensity for both simulations when the checkbox/slider is changed
@@ -741,6 +862,7 @@ class SimulationPage(ttk.Frame):
             self.lockscale["state"] = "normal"
         else:
             self.lockscale["state"] = "disabled"
+        self.measuresChanged()
 
     def disableSliders(self, running=False):
         # updates the visibility of sliders based on their activity and if the sim is running
@@ -761,12 +883,9 @@ class SimulationPage(ttk.Frame):
             self.updateQuar()
             self.updateLock()
 
-    def configMaxPlot(self, viewplot, plots):
-        # finds the max value in all the visible plots
-        maxplot = 0
-        for i in range(len(viewplot)):
-            if viewplot[i] and max(plots[i]) > maxplot:
-                maxplot = max(plots[i])
+    def configMaxPlot(self, viewplot, simulation):
+        # finds the max value in all the visible plots of a simulation up to the current timestep
+        maxplot = simulation.history.getMax(viewplot, self.currentTime)
 
         if maxplot < 46:
             return 50        # minimum y scale up to 50
@@ -791,31 +910,117 @@ class SimulationPage(ttk.Frame):
     def playPauseButton(self, *a):
         if self.simulationOne.runnable and self.simulationTwo.runnable:     # only runs when both simulations can be started
             if self.simRunning:               # if the simulation is already running
-                self.simRunning = False       # the simulation is stopped
+                self.stopSimulation()         # the simulation is stopped
                 self.disableSliders(running=False)
                 self.playlabel.set("▶")       # and the button is set to a play symbol
             else:                             # if the simulation is not running
-                self.simRunning = True        # the simulation is started
                 self.disableSliders(running=True)
                 self.playlabel.set("⏸")      # and the button is set to a pause symbol
-
-                interval = 1 - log(self.speedvalue.get(), 10)    # the time interval between each step in the simulation calculated with the slider
-                simthread = threading.Thread(target=lambda: self.runSimulation(interval=interval))      # a thread is created, running the simulation
-                simthread.daemon = True        # set to daemon, so if the main program stops running, the thread will be killed
-                simthread.start()              # the thread is started
-
-    def runSimulation(self, interval=1):
-        while self.simRunning:            # the thread is set to loop infinitely while the simulation is set to play
-            self.nextTimestep()           # the next timestep is calculated
-            time.sleep(interval)          # thread sleeps to allow for chosen interval
+                self.startSimulation()        # the simulation is started
+
+    def activeFigures(self):
+        return [self.figureOne, self.figureTwo]     # returns the figures of the simulations shown on the page
+
+    def startSimulation(self):
+        # starts a thread calculating the simulations, and starts checking the queue for the timesteps it calculates
+        self.simRunning = True
+        self.stopevent = threading.Event()               # each run has its own event so old queue checks stop with their run
+        interval = 1 - log(self.speedvalue.get(), 10)    # the time interval between each step in the simulation calculated with the slider
+        self.simthread = threading.Thread(target=self.runSimulation, args=(self.activeFigures(), self.currentTime, interval, self.stopevent), name="simulation")
+        self.simthread.daemon = True        # set to daemon, so if the main program stops running, the thread will be killed
+        self.simthread.start()              # the thread is started
+        self.after(self.pollinterval, self.pollSteps, self.stopevent)
+
+    def stopSimulation(self):
+        # shows the timesteps the simulation thread has queued, then stops it without waiting for it, so the gui never freezes
+        # the thread finishes the timestep it is calculating under the figure's lock and calculates no more, and a timestep it
+        # queues after this is dropped, so changes made to the simulations once stopped are never stepped over by it
+        self.simRunning = False
+        self.drainSteps()
+        self.stopevent.set()
+
+    def runSimulation(self, figures, timestep, interval, stopevent):
+        # runs on the simulation thread, calculating timesteps and putting the results in the queue until the run is stopped
+        # only the simulations are used here, the graphs and tkinter are left to the main thread
+        while not stopevent.is_set():
+            timestep += 1
+            self.loadTimesteps(figures, timestep, stopevent=stopevent)     # the timestep is calculated if it has not been already
+            with tracing.span("queue put", "queue", timestep=timestep):
+                tracing.flow("handoff", "queue", timestep)    # links the timestep to the queue check it is taken out by
+                while not stopevent.is_set():
+                    try:
+                        self.stepqueue.put((stopevent, timestep), timeout=0.1)    # waits while the queue is full, checking if the run has been stopped
+                        break
+                    except queue.Full:
+                        pass
+            with tracing.span("interval", "queue", seconds=interval):
+                stopevent.wait(interval)      # thread waits to allow for chosen interval, or until the run is stopped
+
+    def prefetchSteps(self):
+        # runs on the prefetch thread, calculating up to gb.simLookahead timesteps ahead of the shown timestep for each simulation
+        # it stops whenever the simulation is played, as the simulation thread then calculates the timesteps
+        while True:
+            self.prefetchevent.wait()
+            self.prefetchevent.clear()
+            target = self.currentTime + gb.simLookahead
+            figures = [figure for figure in self.activeFigures() if figure.simulation.runnable]
+            while not self.prefetchevent.is_set() and not self.simRunning:
+                behind = [figure for figure in figures if figure.loadedTimesteps <= target]
+                if not behind:
+                    break
+                try:
+                    self.loadTimesteps(behind, ahead=True)     # simulations are stepped together so both are calculated ahead evenly
+                except RuntimeError:
+                    return          # the step pool has been shut down as the program is closing
+
+    def loadTimesteps(self, figures, timestep=None, ahead=False, stopevent=None):
+        # loads a timestep for the simulation of each figure, or the next timestep of each with no timestep given
+        # nothing more is calculated once stopevent is set
+        # simulations whose engines release the GIL are stepped at the same time on the step pool, so a frame takes as long as the
+        # slower simulation; the object engine holds the GIL while it steps, so threads would only add overhead and it is stepped in turn
+        with tracing.span("loadTimesteps", "simulation", timestep=timestep, ahead=ahead):
+            load = lambda figure: figure.loadTimestep(timestep if timestep is not None else figure.loadedTimesteps, ahead, stopevent)
+            if len(figures) > 1 and all(figure.simulation.releasesgil for figure in figures):
+                list(self.steppool.map(load, figures))
+            else:
+                for figure in figures:
+                    load(figure)
+
+    def measuresChanged(self):
+        # undoes the timesteps calculated ahead with the old preventative measures, then calculates ahead again with the new ones
+        for figure in self.activeFigures():
+            figure.settingsChanged()
+        self.prefetchevent.set()
+
+    def pollSteps(self, stopevent):
+        # checks the queue for timesteps calculated by the simulation thread, until the run is stopped
+        if not stopevent.is_set():
+            self.drainSteps()
+            self.after(self.pollinterval, self.pollSteps, stopevent)
+
+    def drainSteps(self):
+        # takes every timestep in the queue and draws the graphs once, up to the latest of them from a run that has not been stopped
+        latest = None
+        with tracing.span("drainSteps", "queue"):
+            while True:
+                try:
+                    stopevent, timestep = self.stepqueue.get_nowait()
+                except queue.Empty:
+                    break
+                tracing.flow("handoff", "queue", timestep, end=True)
+                if not stopevent.is_set():
+                    latest = timestep
+            if latest is not None:
+                self.loadedTime = max(self.loadedTime, latest)
+                self.currentTime = latest
+                self.drawGraphs()
 
     def nextTimestep(self, button=False, *a):
         # button=True when the next timestep button is clicked which can only pass if the simulation is not running
-        if self.simRunning != button:           # (sim running) XOR (next button clicked); allows next timestep to be calculated if only one is true
+        if button and not self.simRunning:
             self.currentTime += 1               # sim timestep is updated
-            self.figureOne.nextTimestep()       # next timestep calculated for first sim
-            self.figureTwo.nextTimestep()       # next timestep calculated for second sim
-            self.drawGraphs()                   # both graphs are updated
+            self.loadTimesteps(self.activeFigures(), self.currentTime)    # next timestep calculated for each sim
+            self.drawGraphs()                   # the graphs are updated
 
     def prevTimestep(self, *a):
         # shows the simulation up to the previous timestep
@@ -834,8 +1039,8 @@ class SimulationPage(ttk.Frame):
         self.drawGraphs()
 
     def lastTimestep(self, *a):
-        # simulation displays everything up to the last loaded timestep
-        self.currentTime = self.figureOne.loadedTimesteps - 1
+        # simulation displays everything up to the last shown timestep, timesteps calculated ahead are not skipped to
+        self.currentTime = self.figureOne.shownTimesteps - 1
         self.drawGraphs()
 
     def resetSim(self, *a):
@@ -844,27 +1049,73 @@ class SimulationPage(ttk.Frame):
             self.playPauseButton()   # pauses the simulation first
         self.loadedTime = 0
         self.currentTime = 0
-        self.figureOne.resetSim()
-        self.figureTwo.resetSim()
+        self.simulationOne.setSeed(gb.simSeed)   # both simulations use the same seed so differences between them
+        self.simulationTwo.setSeed(gb.simSeed)   # come from their settings rather than chance
+        errors = []
+        for figure in (self.figureOne, self.figureTwo):
+            try:
+                figure.resetSim()
+            except sim.MemoryBudgetError as error:   # the simulation is left empty
+                errors.append(error)
         self.drawGraphs()
         self.updateAdvanced()
+        if errors:
+            self.memoryExceeded(errors[0])
+
+    def memoryExceeded(self, error):
+        # tells the user a simulation is over the memory budget, if fallback is on and a leaner engine fits every simulation
+        # on the page the simulations are recreated with it, otherwise they are left empty
+        leaner = None
+        if gb.simMemoryFallback:
+            over = [simulation for simulation in (self.simulationOne, self.simulationTwo) if simulation.country and simulation.disease
+                    and not sim.withinBudget(sim.estimateMemory(simulation.country, simulation.disease))]
+            fits = [sim.leanerEngine(simulation.country, simulation.disease) for simulation in over]
+            if fits and None not in fits:
+                leaner = max(fits, key=list(sim.engines).index)    # the leanest of the engines found fits every simulation
+        if leaner:
+            message = f"{error}\nThe {leaner} engine is used instead."
+            if sim.engines[leaner].fullpopulation:
+                message += f"\nIt simulates the whole population rather than {gb.simCapacity} individuals, so its results are not comparable with the {self.engine} engine's."
+            messagebox.showwarning("Memory Budget", message)
+            gb.simEngine = leaner
+            self.updateEngine()
+        else:
+            messagebox.showerror("Memory Budget", f"{error}\nLower the simulation capacity to run it.")
 
     def drawGraphs(self):
         # updates both graphs
-        self.figureOne.updateGraph()
-        self.figureTwo.updateGraph()
-        self.refreshScale()
-        self.setToDraw.set(1)     # prompts the graphs to draw on screen
+        with tracing.span("drawGraphs", "gui", timestep=self.currentTime):
+            self.figureOne.updateGraph()
+            self.figureTwo.updateGraph()
+            self.refreshScale()
+            self.drawAllCanvas()      # draws the graphs on screen
+        self.prefetchevent.set()  # the timesteps after the shown timestep are calculated ahead
 
     def drawAllCanvas(self, *a):
         # loops through all canvas objects that are on the currently selected tab and draws them onto the screen
+        # canvas objects on hidden tabs are marked dirty instead, and drawn when their tab is selected
         canvasid = self.tabControl.index(self.tabControl.select())
-        for c in self.canvasList[canvasid]:
-            c.draw()
+        for i, pagecanvas in enumerate(self.canvasList):
+            for c in pagecanvas:
+                if i == canvasid:
+                    c.draw()
+                else:
+                    c.dirty = True
 
         if canvasid == 2:
             self.updateAdvanced()     # if the advanced tab is selected the advanced data is updated
 
+    def tabChanged(self, *a):
+        # draws the canvas objects on the newly selected tab that have changed since it was last shown
+        canvasid = self.tabControl.index(self.tabControl.select())
+        with tracing.span("tab switch", "gui", tab=canvasid):
+            for c in self.canvasList[canvasid]:
+                if c.dirty:
+                    c.draw()
+
+            if canvasid == 2:
+                self.updateAdvanced()
+
     def editVar(self, num=1, loc=False):
         # edits a simulation variable, num=the number of the variable being edited (1 or 2) and loc is true when editing a location
         gb.simEditing = num
@@ -913,11 +1164,11 @@ class DiseaseCompPage(SimulationPage):
         disease2 = gb.simDisease2
 
         if self.varsChanged(country, disease1, disease2) or bypass:
-            # changes the objects in each simulation
-            self.simulationOne.setLocation(country)
-            self.simulationTwo.setLocation(country)
-            self.simulationOne.setDisease(disease1)
-            self.simulationTwo.setDisease(disease2)
+            # changes the objects in each simulation, they are reset once by resetSim below, which handles simulations over the memory budget
+            self.simulationOne.country = country
+            self.simulationTwo.country = country
+            self.simulationOne.disease = disease1
+            self.simulationTwo.disease = disease2
 
             # updates the titles of the graphs
             if country:
@@ -981,11 +1232,11 @@ class LocationCompPage(SimulationPage):
         country2 = gb.simLocation2
 
         if self.varsChanged(disease, country1, country2) or bypass:
-            # changes the objects in each simulation
-            self.simulationOne.setLocation(country1)
-            self.simulationTwo.setLocation(country2)
-            self.simulationOne.setDisease(disease)
-            self.simulationTwo.setDisease(disease)
+            # changes the objects in each simulation, they are reset once by resetSim below, which handles simulations over the memory budget
+            self.simulationOne.country = country1
+            self.simulationTwo.country = country2
+            self.simulationOne.disease = disease
+            self.simulationTwo.disease = disease
 
             # updates the titles of the graphs
             if disease:
@@ -1143,6 +1394,7 @@ class PreventativeCompPage(SimulationPage):
             vaccper2 = 0
             self.vaccscale2["state"] = "disabled"
         self.simulationTwo.vaccinated_perc = vaccper2
+        self.measuresChanged()
 
     def updateQuar(self, *a):
         # overrides the deafult function to update each simulation separately
@@ -1163,6 +1415,7 @@ class PreventativeCompPage(SimulationPage):
             self.quarscale2["state"] = "normal"
         else:
             self.quarscale2["state"] = "disabled"
+        self.measuresChanged()
 
     def updateLock(self, *a):
         # overrides the deafult function to update each simulation separately
@@ -1183,6 +1436,7 @@ class PreventativeCompPage(SimulationPage):
             self.lockscale2["state"] = "normal"
         else:
             self.lockscale2["state"] = "disabled"
+        self.measuresChanged()
 
     def disableSliders(self, running=False):
         # performs the same as parent function but for the newly added sliders/checkbutons, then calls parent function
@@ -1210,11 +1464,11 @@ class PreventativeCompPage(SimulationPage):
         country = gb.simLocation1
 
         if self.varsChanged(disease, country) or bypass:
-            # changes the objects in each simulation
-            self.simulationOne.setLocation(country)
-            self.simulationTwo.setLocation(country)
-            self.simulationOne.setDisease(disease)
-            self.simulationTwo.setDisease(disease)
+            # changes the objects in each simulation, they are reset once by resetSim below, which handles simulations over the memory budget
+            self.simulationOne.country = country
+            self.simulationTwo.country = country
+            self.simulationOne.disease = disease
+            self.simulationTwo.disease = disease
 
             # updates the titles of the graphs
             if disease:
@@ -1263,7 +1517,7 @@ class SingleSimulationPage(SimulationPage):
         # overrides the normal simulation tab to display only one graph
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (7, 5))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (7, 5))
         graphOne.getCanvas().grid(row=0, column=0)
         pagecanvas.append(graphOne)
         self.canvasList.append(pagecanvas)
@@ -1290,7 +1544,7 @@ class SingleSimulationPage(SimulationPage):
         # overrides the normal simplified tab to display only one graph
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (9.8, 4.9))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (9.8, 4.9))
         graphOne.getCanvas().grid(row=1, column=0, columnspan=2)
         pagecanvas.append(graphOne)
         self.canvasList.append(pagecanvas)
@@ -1310,7 +1564,7 @@ class SingleSimulationPage(SimulationPage):
         # overrides the normal advanced tab to display only one graph
         pagecanvas = []
         graph_frame = ttk.Frame(tab)
-        graphOne = sim.DrawableCanvas(graph_frame, self.figureOne, (7, 5))
+        graphOne = sf.DrawableCanvas(graph_frame, self.figureOne, (7, 5))
         graphOne.getCanvas().grid(row=0, column=0)
         pagecanvas.append(graphOne)
         self.canvasList.append(pagecanvas)
@@ -1348,6 +1602,7 @@ class SingleSimulationPage(SimulationPage):
         ttk.Label(info_frame1, textvar=self.adv_alltime_1, font=("Verdana", 14)).grid(row=2, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_recovered_1, font=("Verdana", 14)).grid(row=3, column=1, sticky="w")
         ttk.Label(info_frame1, textvar=self.adv_deaths_1, font=("Verdana", 14)).grid(row=4, column=1, sticky="w")
+        self.adv_timers_1 = self.timerLabels(info_frame1, row=5)
         info_frame1.grid(row=1, column=1)
 
         self.updateAdvanced()
@@ -1401,9 +1656,9 @@ class SingleSimulationPage(SimulationPage):
         country = gb.simLocation1
 
         if self.varsChanged(disease, country) or bypass:
-            # changes the objects in the simulation
-            self.simulationOne.setLocation(country)
-            self.simulationOne.setDisease(disease)
+            # changes the objects in the simulation, it is reset once by resetSim below, which handles simulations over the memory budget
+            self.simulationOne.country = country
+            self.simulationOne.disease = disease
 
             # updates the titles of the graph
             if disease:
@@ -1430,33 +1685,25 @@ class SingleSimulationPage(SimulationPage):
         # overrides the normal play pause function to only check for one valid simulation object
         if self.simulationOne.runnable:     # only runs when the simulation can be started
             if self.simRunning:               # if the simulation is already running
-                self.simRunning = False       # the simulation is stopped
+                self.stopSimulation()         # the simulation is stopped
                 self.playlabel.set("▶")       # and the button is set to a play symbol
             else:                             # if the simulation is not running
-                self.simRunning = True        # the simulation is started
                 self.playlabel.set("⏸")      # and the button is set to a pause symbol
+                self.startSimulation()        # the simulation is started
 
-                interval = 1 - log(self.speedvalue.get(), 10)    # the time interval between each step in the simulation calculated with the slider
-                simthread = threading.Thread(target=lambda: self.runSimulation(interval=interval))      # a thread is created, running the simulation
-                simthread.daemon = True        # set to daemon, so if the main program stops running, the thread will be killed
-                simthread.start()              # the thread is started
-
-    def nextTimestep(self, button=False, *a):
-        # overrides the normal next timestep function to only call the next timestep of one simulation
-        # button=True when the next timestep button is clicked which can only pass if the simulation is not running
-        if self.simRunning != button:             # (sim running) XOR (next button clicked); allows next timestep to be calculated if only one is true
-            self.currentTime += 1               # sim timestep is updated
-            self.figureOne.nextTimestep()       # next timestep calculated for first sim
-            self.drawGraphs()                   # both graphs are updated
+    def activeFigures(self):
+        return [self.figureOne]     # overrides the normal function as only the first simulation is shown
 
     def updateAdvanced(self):
         # overrides the normal function to only display advanced info for one simulation
         t = self.currentTime
-        self.adv_newcases_1.set(self.figureOne.simulation.newplot[t])
-        self.adv_current_1.set(self.figureOne.simulation.infplot[t])
-        self.adv_alltime_1.set(sum(self.figureOne.simulation.newplot[:t+1])+self.figureOne.simulation.infplot[0])
-        self.adv_recovered_1.set(self.figureOne.simulation.recplot[t])
-        self.adv_deaths_1.set(self.figureOne.simulation.morplot[t])
+        history = self.figureOne.simulation.history
+        self.adv_newcases_1.set(history.data[4, t])
+        self.adv_current_1.set(history.data[1, t])
+        self.adv_alltime_1.set(history.getTotal(4, t) + history.data[1, 0])    # running total of new cases plus the starting infected
+        self.adv_recovered_1.set(history.data[2, t])
+        self.adv_deaths_1.set(history.data[3, t])
+        self.updateTimers(self.figureOne.simulation, self.adv_timers_1, t)
 
 
 class StartingScreen(ttk.Frame):
@@ -1480,6 +1727,15 @@ class ClosingScreen(ttk.Frame):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pandemic simulator.")
+    parser.add_argument("--trace", metavar="FILE", help="records the simulations, their threads and the graph drawing to a trace event json file, written on closing")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.start()
+
     PandemicApp = App()
     PandemicApp.protocol("WM_DELETE_WINDOW", PandemicApp.close)    # assigns a function to run when the window is closed
     PandemicApp.mainloop()
+
+    if args.trace:
+        print(f"Wrote {tracing.stop(args.trace)} trace events to {args.trace}")
@@ -0,0 +1,63 @@
+import globalvars as gb             # global variables
+import simulation as sim            # the simulation engines
+from benchmark import pickLocations # picks the densest and sparsest large countries
+
+import argparse
+import sys
+import tracemalloc
+
+
+def measureMemory(location, disease, engine, capacity, steps=20, seed=0):
+    # returns the peak memory in bytes traced while creating a simulation, running it for a number of steps and saving a snapshot,
+    # with the number of individuals and grid width it simulated; the memory budget is turned off so any simulation can be measured,
+    # and fallback is off so the engine measured is always the one asked for
+    gb.simCapacity = capacity
+    budget, gb.simMemoryBudget = gb.simMemoryBudget, None
+    tracemalloc.start()
+    try:
+        simulation = sim.createSimulation(location, disease, engine=engine, seed=seed, fallback=False)
+        simulation.runSimulation(steps)
+        simulation.getSnapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        gb.simMemoryBudget = budget
+    return peak, simulation.individuals, simulation.gridwidth
+
+
+def checkEstimates(locations, disease, engines, capacities, steps=20, seed=0):
+    # compares the estimated memory of every engine on every location at every capacity with the measured peak
+    # returns a list of the estimates lower than the measured peak, which is empty when every estimate is high enough
+    problems = []
+    for engine in engines:
+        for location in locations:
+            for capacity in capacities:
+                estimate = sim.estimateMemory(location, disease, engine, capacity)
+                peak, individuals, gridwidth = measureMemory(location, disease, engine, capacity, steps, seed)
+                print(f"{engine:12} {location.name:12} {capacity:8} {individuals:9} {gridwidth:5} "
+                      f"{estimate / 2**20:9.1f} MB estimated {peak / 2**20:9.1f} MB measured")
+                if estimate < peak:
+                    problems.append(f"{engine} {location.name} {capacity} measured {peak / 2**20:.1f} MB, "
+                                    f"over the {estimate / 2**20:.1f} MB estimate")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the peak memory of the simulation engines and checks the estimates used by the memory budget cover it.")
+    parser.add_argument("-e", "--engines", nargs="+", choices=list(sim.engines), default=list(sim.engines), help="engines measured (default all)")
+    parser.add_argument("-c", "--capacities", nargs="+", type=int, default=[10000, 100000], help="simulation capacities measured (default 10000 100000)")
+    parser.add_argument("-l", "--locations", nargs="+", help="locations measured (default the densest and sparsest large countries)")
+    parser.add_argument("-d", "--disease", help="disease simulated (default the one with the longest infectious period)")
+    parser.add_argument("-n", "--steps", type=int, default=20, help="number of timesteps run (default 20)")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed of every simulation (default 0)")
+    args = parser.parse_args()
+
+    locations = gb.loadLocations()
+    chosen = [locations[name] for name in args.locations] if args.locations else pickLocations(locations, count=1)
+    diseases = gb.loadDiseases()
+    # the compartment engine counts every infection length, so the longest infectious period uses the most memory
+    disease = diseases[args.disease] if args.disease else max(diseases.values(), key=lambda d: d.infectious)
+    problems = checkEstimates(chosen, disease, args.engines, args.capacities, args.steps, args.seed)
+    for problem in problems:
+        print("FAIL: " + problem)
+    sys.exit(1 if problems else 0)
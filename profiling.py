@@ -0,0 +1,81 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+
+
+# profiles a simulation run twice, once with cProfile for exact call counts and times, and once with a sampling profiler
+# that records the stack every interval so the time of each call path is seen without slowing down every function call
+# the sampled stacks are written in the collapsed format read by flamegraph.pl, speedscope and other flamegraph tools
+
+
+def frameName(frame):
+    # returns the name a frame is shown as in the stacks, the file and function it is in
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+def sampleStacks(threadid, rootcode, stopevent, interval, stacks):
+    # runs on the sampling thread, counting the stack of the profiled thread every interval seconds until stopevent is set
+    # the stack is taken from the frame below the one running rootcode, so only the profiled function and its calls are shown
+    while not stopevent.wait(interval):
+        frame = sys._current_frames().get(threadid)
+        names = []
+        while frame is not None and frame.f_code is not rootcode:
+            names.append(frameName(frame))
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+
+
+def sampleCall(function, interval=0.001):
+    # calls a function while sampling the stack of the calling thread, returns a Counter of the number of samples of each stack
+    stacks = Counter()
+    stopevent = threading.Event()
+    sampler = threading.Thread(target=sampleStacks, args=(threading.get_ident(), sys._getframe().f_code, stopevent, interval, stacks), name="sampler")
+    switchinterval = sys.getswitchinterval()
+    sys.setswitchinterval(interval)     # the profiled thread keeps the GIL for up to the switch interval, so it is lowered to let the sampler in on time
+    sampler.start()
+    try:
+        function()
+    finally:
+        stopevent.set()
+        sampler.join()
+        sys.setswitchinterval(switchinterval)
+    return stacks
+
+
+def writeReport(f, profile, stacks, top=30):
+    # writes the functions with the most time spent in them to a file, sorted by their own time under cProfile
+    # and by the number of samples they were running in
+    f.write("cProfile, sorted by time spent in each function excluding its calls\n")
+    pstats.Stats(profile, stream=f).strip_dirs().sort_stats("tottime").print_stats(top)
+
+    samples = sum(stacks.values())
+    running = Counter()
+    for stack, count in stacks.items():
+        running[stack.rsplit(";", 1)[-1]] += count      # the last frame of a stack is the function that was running
+    f.write(f"Sampling, {samples} samples, sorted by samples the function was running in\n\n")
+    f.write(f"{'samples':>9} {'percent':>8}  function\n")
+    for name, count in running.most_common(top):
+        f.write(f"{count:9} {100 * count / samples:7.1f}%  {name}\n")
+
+
+def profileSimulation(simulation, steps, prefix, interval=0.001, top=30):
+    # profiles initialising the simulation and running it for a number of steps, writing the hottest functions to prefix.txt
+    # and the sampled stacks to prefix.folded, the simulation is reset before each run so both profile the same run
+    def run():
+        simulation.resetSim()
+        simulation.runSimulation(steps)
+
+    profile = cProfile.Profile()
+    profile.runcall(run)
+    stacks = sampleCall(run, interval)
+
+    with open(prefix + ".txt", "w") as f:
+        writeReport(f, profile, stacks, top)
+    with open(prefix + ".folded", "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+    return prefix + ".txt", prefix + ".folded"
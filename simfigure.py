@@ -0,0 +1,290 @@
+import matplotlib.pyplot as plt           # plots/creates matplotlib graphs
+from matplotlib.figure import Figure      # creates matplotlib figures
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg   # allows matplotlib figures on tkinter gui
+import numpy as np
+import math
+import threading
+import tracing                            # records trace events when tracing is turned on
+
+
+class SimulationFigure:
+    # holds the graph settings of a simulation and keeps every GraphView of it (one per tab) up to date with the simulation's plots
+
+    def __init__(self, ctrl, simulation):
+        self.ctrl = ctrl                   # the page the figure is going on
+        self.simulation = simulation       # the simulatin object of the figure
+
+        self.loadedTimesteps = 1
+        self.shownTimesteps = 1            # number of timesteps that have been shown on the graph, later loaded timesteps were calculated ahead
+        self.snapshot = None               # state of the simulation saved before timesteps were calculated ahead, so they can be undone
+        self.lock = threading.Lock()       # held while the simulation is changed, as timesteps are calculated on other threads
+        self.uselegend = True
+
+        self.colours = ["blue", "red", "green", "black", "purple"]          # colours of the plots
+        self.plotname = ["Sus", "Inf", "Rec", "Dead", "New"]                 # stores associated names for the plots for use in legend
+        self.vislist = [0, 1, 0, 0, 1]                                       # stores associated boolean values for if the plot is visible
+
+        self.ensemble = None        # ensemble result used to draw percentile bands around the plots
+        self.bandrange = (5, 95)
+
+        self.views = []             # graphs of the simulation, each tab has its own figure so none have to be resized when drawn
+        self.xlimit = None          # current x axis limit, grown in steps so the background of the graph is not redrawn every timestep
+        self.ylimit = None          # current y axis limit
+        self.version = 0            # increased whenever the background of the figures (axes, limits, legend) changes
+
+        self.updateGraph()
+
+    def createView(self, figsize):
+        # creates a new graph of the simulation with its own figure of the given size, used by DrawableCanvas objects
+        view = GraphView(self, figsize)
+        self.views.append(view)
+        view.updateLegend()
+        view.setLimits(self.xlimit, self.ylimit)
+        view.setData(self.xplot, self.values)
+        view.updateBands()
+        return view
+
+    def getMaxPoint(self):
+        maxplot = self.simulation.history.getMax(self.vislist, self.ctrl.currentTime)   # the max of the visible plots up to the current timestep
+
+        if maxplot < 46:
+            return 50                                  # minimum y axis limit is 50
+        else:
+            return roundLimit(int(maxplot * 1.1))      # y axis max is set higher to leave room between top of the graph and figure
+
+    def updateLegend(self):
+        self.version += 1          # the legend is part of the background so it must be redrawn
+        for view in self.views:
+            view.updateLegend()
+
+    def setVisible(self, vis):
+        # takes a list of boolean values that decide visibility
+        self.vislist = vis
+        self.updateLegend()
+
+    def configLimit(self, limit):
+        # takes a limit for the y axis and sets the figures y axis limit to that, used for scaling graphs
+        # nothing is changed if the limit is the same, so the background does not need to be redrawn
+        if limit != self.ylimit:
+            self.ylimit = limit
+            self.updateGraph()
+            self.updateLegend()
+
+    def setBands(self, ensemble, lower=5, upper=95):
+        # takes an EnsembleResult from ensemble.py and shades the area between two of its percentiles for every visible plot
+        # no ensemble removes the bands
+        self.ensemble = ensemble
+        self.bandrange = (lower, upper)
+        self.updateGraph()
+
+    def setSim(self, simulation):
+        # takes a simulation object and sets the figure's simulation to that object, then resets the figure/sim
+        with self.lock:
+            self.simulation = simulation
+        self.resetSim()
+
+    def resetSim(self):
+        # the graph is reset even if the simulation raises an error, such as being over the memory budget
+        try:
+            with self.lock:
+                self.loadedTimesteps = 1
+                self.shownTimesteps = 1
+                self.snapshot = None
+                self.simulation.resetSim()
+        finally:
+            self.updateGraph()
+
+    def loadTimestep(self, timestep, ahead=False, stopevent=None):
+        # calculates timesteps of the simulation until the given timestep is loaded
+        # if the timestep is lower than the loaded timesteps nothing is unecessarily loaded
+        # only uses the simulation, so it can be called from the simulation thread
+        # ahead=True when the timesteps are calculated before they are needed, the state of the simulation is then saved
+        # before the first of them so they can be undone if the settings are changed before they are shown
+        # the loaded timesteps are checked under the lock, so the simulation and prefetch threads never both step past the timestep
+        # stopevent is checked under the lock too, so a stopped run never steps a simulation that was reset after it was stopped
+        with self.lock:
+            while self.loadedTimesteps <= timestep and not (stopevent and stopevent.is_set()):
+                if ahead and self.loadedTimesteps <= self.shownTimesteps:
+                    self.snapshot = self.simulation.getSnapshot()
+                self.simulation.nextTimestep()
+                self.loadedTimesteps += 1
+
+    def settingsChanged(self):
+        # undoes the timesteps calculated ahead that have not been shown, so the changed settings are used from the shown timestep on
+        # the timesteps between the snapshot and the shown timestep are calculated again with the settings they were shown with
+        with self.lock, tracing.span("rewind", "simulation"):
+            if self.snapshot is None or self.loadedTimesteps <= self.shownTimesteps:
+                self.snapshot = None        # every calculated timestep has been shown, so there is nothing to undo
+                return
+            names = ("startinf", "vaccinated_perc", "usequarantine", "quarantine_lvl", "uselockdown", "lockdown_intensity")
+            settings = {name: getattr(self.simulation, name) for name in names}
+            self.simulation.restoreSnapshot(self.snapshot)
+            self.loadedTimesteps = self.simulation.timestep + 1
+            while self.loadedTimesteps < self.shownTimesteps:
+                self.simulation.nextTimestep()
+                self.loadedTimesteps += 1
+            for name, value in settings.items():
+                setattr(self.simulation, name, value)
+            self.snapshot = None
+
+    def updateGraph(self):
+        self.xplot, self.values = self.simulation.getGraphPlots(self.ctrl.currentTime)   # gets timesteps and simulation plots up to the current timestep
+        self.shownTimesteps = max(self.shownTimesteps, len(self.xplot))
+
+        # the x limit is the current timestep rounded up, so it only changes every few timesteps; the x axis is part of the saved
+        # background, so a limit following every timestep would need a full draw every frame rather than a blit of the plots
+        xlimit = roundLimit(max(len(self.xplot) - 1, 1))
+        if xlimit != self.xlimit:
+            self.xlimit = xlimit
+            self.version += 1
+
+        for view in self.views:
+            view.setLimits(self.xlimit, self.ylimit)
+            view.setData(self.xplot, self.values)     # every view plots the same views of the simulation's history
+            view.updateBands()
+
+
+class GraphView:
+    # a matplotlib figure showing the plots of a SimulationFigure, its layout is set once when it is created
+
+    def __init__(self, simfigure, figsize):
+        self.simfigure = simfigure
+
+        self.linefigure = Figure(figsize=figsize, dpi=100)                                                  # creates a matplotlib figure of the given size
+        self.linefigure.subplots_adjust(left=0.12, right=0.94, top=0.975, bottom=0.08, wspace=0, hspace=0)  # removes the white space around the figure
+
+        self.figplot = self.linefigure.add_subplot(111)                 # creates a plot on the figure
+        self.plotlist = []                                              # stores the plots in list for accessibility and editing
+        for colour in simfigure.colours:
+            plot, = self.figplot.plot([], [], colour)
+            self.plotlist.append(plot)
+        for artist in self.plotlist + list(self.figplot.spines.values()):
+            artist.set_animated(True)       # plots are left out of full draws so canvases can blit them onto a saved background,
+                                            # along with the axes lines which are drawn over them
+
+        self.leg = None             # legend of the figure
+        self.bandplots = []         # stores the drawn percentile bands so they can be removed when redrawn
+
+    def getFigure(self):
+        return self.linefigure        # returns the figure for use in DrawableCanvas objects
+
+    def getAnimated(self):
+        # returns the artists that change every timestep, which are drawn over the saved background of the figure
+        # the axes lines and legend are included so they are still drawn above the plots, artists are returned in the order they are drawn
+        artists = self.plotlist + self.bandplots + list(self.figplot.spines.values())
+        if self.figplot.get_legend() is not None:
+            artists.append(self.figplot.get_legend())
+        return sorted(artists, key=lambda artist: artist.get_zorder())
+
+    def getVisiblePlots(self):
+        plotli, nameli = [], []
+        for i in range(len(self.plotlist)):                  # loops through figure plots
+            if self.simfigure.vislist[i]:
+                plotli.append(self.plotlist[i])              # for every plot that is visible, it is appended to the plot list
+                nameli.append(self.simfigure.plotname[i])    # and its name appended to the name list
+        return plotli, nameli
+
+    def updateLegend(self):
+        if not self.simfigure.uselegend:     # if the figure is selected to not be shown
+            if self.leg is not None:
+                self.leg.remove()            # the legend is removed and the function returns
+                self.leg = None
+            return 0
+        p, n = self.getVisiblePlots()     # gets a list of visible figure plots and a list of corresponding names for the legend
+        if len(p) > 0:
+            # if there is more than one visible plot, the legend is set in the top left
+            self.leg = self.figplot.legend(p, n, loc="upper left", fancybox=False)
+            self.leg.set_animated(True)
+
+    def setLimits(self, xlimit, ylimit):
+        # sets the axis limits, the x axis is set between 0 and 1 if there is no limit yet and the y axis is left to matplotlib
+        self.figplot.set_xlim(0, xlimit or 1)
+        if ylimit is not None:
+            self.figplot.set_ylim(0, ylimit)
+
+    def setData(self, xplot, values):
+        for i, plot in enumerate(self.plotlist):     # loops through figure plots with i storing its index in the list of plots
+            plot.set_data(xplot, values[i])          # plots to values to the figure
+            if self.simfigure.vislist[i]:
+                plot.set_linestyle("-")              # if the current figure plot is selected to be visible, its linestyle is turned on
+            else:
+                plot.set_linestyle("none")           # otherwise its linestyle is set to none
+
+    def updateBands(self):
+        for band in self.bandplots:
+            band.remove()             # the previously drawn bands are removed
+        self.bandplots = []
+        ensemble = self.simfigure.ensemble
+        if ensemble is None:
+            return
+
+        lower, upper = self.simfigure.bandrange
+        xplot = self.simfigure.xplot
+        end = min(len(xplot), ensemble.mean.shape[1])      # bands are drawn up to the current timestep, or the end of the ensemble
+        for i, plot in enumerate(self.plotlist):
+            if self.simfigure.vislist[i]:
+                band = self.figplot.fill_between(xplot[:end], ensemble.getPlot(i, lower)[:end], ensemble.getPlot(i, upper)[:end],
+                                                 color=plot.get_color(), alpha=0.2, linewidth=0, animated=True)
+                self.bandplots.append(band)
+
+
+class DrawableCanvas:
+
+    def __init__(self, master, figure, figsize):
+        # function takes the frame it will be placed, the SimulationFigure object, and the desired figure size as a list
+        # the canvas is given its own view of the figure, so figures are never resized between tabs
+        self.simfigure = figure
+        self.view = figure.createView(figsize)
+        self.figure = self.view.getFigure()
+        self.background = None       # saved image of the figure without its plots, blitted under the plots each draw
+        self.version = None          # version of the figure the background was saved from
+        self.dirty = True            # true when the figure has changed since the canvas was last drawn, e.g. while its tab was hidden
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)   # creates a tkinter canvas that can display matplotlib figures
+        self.draw()
+
+    def getCanvas(self):
+        return self.canvas.get_tk_widget()     # returns the canvas widget allowing it to be placed in a tkinter frame
+
+    def draw(self):
+        # only the plots are redrawn over the saved background, unless the background has changed
+        if self.background is None or self.version != self.simfigure.version:
+            with tracing.span("FigureCanvasTkAgg.draw", "gui"):
+                self.canvas.draw()                           # full draw, which leaves out the animated plots
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self.version = self.simfigure.version
+        else:
+            self.canvas.restore_region(self.background)
+
+        with tracing.span("blit", "gui"):
+            renderer = self.canvas.get_renderer()
+            for artist in self.view.getAnimated():
+                artist.draw(renderer)
+            self.canvas.blit(self.figure.bbox)
+        self.dirty = False
+
+
+def roundLimit(value):
+    # rounds a graph limit up to 1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6 or 8 times a power of ten, so limits stay the same over many timesteps
+    power = 10 ** math.floor(math.log10(value))
+    for step in (1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10):
+        if value <= step * power:
+            return int(round(step * power))
+
+
+def plotSingleGraph(simulation):
+    # plots the graph of a simulation when simulation.py is ran by itself
+    xaxis = np.arange(simulation.timestep+1)
+    plt.plot(xaxis, simulation.infplot, label="infected")
+    plt.plot(xaxis, simulation.morplot, label="deceased")
+    plt.bar(xaxis, simulation.newplot, label="new cases", width=1)
+    plt.xlabel("timestep")
+    plt.ylabel("population")
+    plt.title("disease spread")
+    plt.xlim((0, simulation.timestep))
+
+    print("Most new cases in a day: " + str(sorted(simulation.newplot)[-1]))
+    print("Amount of people infected: " + str(simulation.individuals-simulation.susplot[-1]))
+    print("Total deaths: " + str(simulation.morplot[-1]))
+
+    plt.show()
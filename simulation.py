@@ -1,11 +1,190 @@
 import globalvars as gb   # global variables
-
-import matplotlib.pyplot as plt           # plots/creates matplotlib graphs
-from matplotlib.figure import Figure      # creates matplotlib figures
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg   # allows matplotlib figures on tkinter gui
+import tracing            # records trace events when tracing is turned on
 
 import numpy as np
+import gc
 import math
+import json
+import struct
+import time
+import warnings
+import zipfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+
+SUSCEPTIBLE, INFECTED, RECOVERED, DEAD = 0, 1, 2, 3    # indexes of each state on a grid location, also used as population array states
+
+
+class MemoryBudgetError(MemoryError):
+    # raised by simInit when a simulation is estimated to use more memory than gb.simMemoryBudget, before it is created
+    pass
+
+
+class RandomBuffer:
+    # stores random numbers drawn in bulk from a numpy generator and hands them out one at a time,
+    # avoiding the overhead of a separate numpy call for every random number
+
+    def __init__(self, draw, size=65536):
+        self.draw = draw        # generator method that draws an array of random numbers of a given size
+        self.size = size        # minimum amount of numbers drawn each time the buffer is refilled
+        self.values = []        # list of buffered random numbers
+        self.index = 0          # index of the next number to hand out
+
+    def reserve(self, count):
+        # makes sure at least count numbers are buffered, refilling the buffer with one draw if there are not enough
+        if len(self.values) - self.index < count:
+            self.values = self.values[self.index:] + self.draw(max(count, self.size)).tolist()
+            self.index = 0
+
+    def next(self):
+        # returns the next random number in the buffer
+        if self.index >= len(self.values):
+            self.reserve(1)
+        self.index += 1
+        return self.values[self.index - 1]
+
+    def take(self, count):
+        # returns a list of the next count random numbers in the buffer
+        self.reserve(count)
+        self.index += count
+        return self.values[self.index - count:self.index]
+
+
+def readOnly(view):
+    # returns a read-only view of an array, a new view is made so the original array stays writeable
+    view = view.view()
+    view.flags.writeable = False
+    return view
+
+
+@contextmanager
+def gcPaused():
+    # pauses the cyclic garbage collector in a with block that makes millions of lists, which it would otherwise scan over and over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def stoppedClock():
+    # used in place of time.perf_counter while the timers are off, so timesteps run the same code either way
+    return 0
+
+
+class History:
+    # stores the graph plots (susceptible, infected, recovered, mortalities, new cases) of a simulation in a preallocated
+    # numpy array that doubles in size when full, so adding a timestep is constant time and graphs are given views not copies
+    # the running total and running max of every plot are kept alongside it so they can be looked up at any timestep
+
+    def __init__(self, plots, size=256):
+        plots = np.array(plots, dtype=np.int64).reshape(5, -1)    # takes the starting values of each plot, or every plot so far
+        self.length = plots.shape[1]                               # number of timesteps stored
+        self.data = np.zeros((5, max(size, 2 * self.length)), dtype=np.int64)
+        self.totals = np.zeros_like(self.data)                     # totals[i, t] is the sum of plot i from timestep 0 to t
+        self.maxima = np.zeros_like(self.data)                     # maxima[i, t] is the max of plot i from timestep 0 to t
+        self.data[:, :self.length] = plots
+        self.totals[:, :self.length] = np.cumsum(plots, axis=1)
+        self.maxima[:, :self.length] = np.maximum.accumulate(plots, axis=1)
+        self.xaxis = np.arange(self.data.shape[1])                 # timesteps shared by every graph
+
+    def append(self, values):
+        # adds the values of the next timestep to the end of each plot and updates the running totals and maxima
+        if self.length == self.data.shape[1]:
+            self.data = self.grow(self.data)                        # the buffers are doubled when full
+            self.totals = self.grow(self.totals)
+            self.maxima = self.grow(self.maxima)
+            self.xaxis = np.arange(self.data.shape[1])
+        t = self.length
+        self.data[:, t] = values
+        self.totals[:, t] = self.totals[:, t-1] + self.data[:, t]
+        self.maxima[:, t] = np.maximum(self.maxima[:, t-1], self.data[:, t])
+        self.length += 1
+
+    def grow(self, array):
+        # returns a copy of an array with double the space, existing views keep pointing at the old array so stay valid
+        grown = np.zeros((5, 2 * array.shape[1]), dtype=np.int64)
+        grown[:, :self.length] = array[:, :self.length]
+        return grown
+
+    def truncate(self, length):
+        # drops every timestep after the given number of timesteps
+        self.length = min(self.length, length)
+
+    def getTotal(self, index, timestep):
+        # returns the sum of a plot from timestep 0 up to and including the given timestep
+        return int(self.totals[index, min(timestep, self.length - 1)])
+
+    def getMax(self, visible, timestep):
+        # returns the largest value up to the given timestep of the plots selected by a list of booleans, 0 if none are selected
+        visible = np.flatnonzero(visible)
+        if len(visible) == 0:
+            return 0
+        return int(self.maxima[visible, min(timestep, self.length - 1)].max())
+
+    def getPlot(self, index):
+        # returns a read-only view of one plot
+        return readOnly(self.data[index, :self.length])
+
+    def getPlots(self):
+        # returns a read-only view of every plot as an array with shape (5, timesteps)
+        return readOnly(self.data[:, :self.length])
+
+    def getGraphPlots(self, end):
+        # returns read-only views of the timesteps and plots up to (not including) the given end
+        end = min(end, self.length)
+        return readOnly(self.xaxis[:end]), readOnly(self.data[:, :end])
+
+
+class PhaseTimer:
+    # stores the wall time and number of individuals of each phase of every timestep in preallocated numpy arrays that double
+    # in size when full, like History; index t holds timestep t, so index 0 is left empty as timestep 0 is not calculated
+
+    phases = ["infect", "recover", "move", "lockdown"]    # phases of a timestep in the order they are stored
+
+    def __init__(self, size=256):
+        self.length = 1                                                     # number of timesteps stored, including timestep 0
+        self.times = np.zeros((len(self.phases), size))                     # seconds taken by each phase
+        self.agents = np.zeros((len(self.phases), size), dtype=np.int64)    # number of individuals each phase went through
+        self.steptimes = np.zeros(size)                                     # seconds taken by the whole timestep
+
+    def record(self, timestep, steptime, times, agents):
+        # stores the timings of a timestep, timesteps calculated again after the simulation is rewound replace the old ones
+        if timestep >= self.steptimes.size:
+            size = max(2 * self.steptimes.size, timestep + 1)     # the arrays are doubled when full
+            self.times = np.pad(self.times, ((0, 0), (0, size - self.steptimes.size)))
+            self.agents = np.pad(self.agents, ((0, 0), (0, size - self.steptimes.size)))
+            self.steptimes = np.pad(self.steptimes, (0, size - self.steptimes.size))
+        self.times[:, timestep] = times
+        self.agents[:, timestep] = agents
+        self.steptimes[timestep] = steptime
+        self.length = timestep + 1
+
+    def truncate(self, length):
+        # drops every timestep after the given number of timesteps
+        self.length = min(self.length, length)
+
+    def getTimes(self):
+        # returns a read-only view of the seconds taken by each phase, with shape (phases, timesteps)
+        return readOnly(self.times[:, :self.length])
+
+    def getAgents(self):
+        # returns a read-only view of the number of individuals each phase went through, with shape (phases, timesteps)
+        return readOnly(self.agents[:, :self.length])
+
+    def getStepTimes(self):
+        # returns a read-only view of the seconds taken by each timestep
+        return readOnly(self.steptimes[:self.length])
+
+    def getStepRate(self, timestep, window=10):
+        # returns the number of timesteps calculated per second over the window of timesteps up to the given timestep, 0 if none
+        end = min(timestep, self.length - 1) + 1
+        start = max(1, end - window)
+        seconds = self.steptimes[start:end].sum()
+        return (end - start) / seconds if seconds > 0 else 0
 
 
 class Individual:
@@ -29,9 +208,22 @@ class Individual:
             return 0                           # otherwise a chance of 0 is returned
 
 
-class Simulation:
+class Engine(ABC):
+    # interface every simulation engine implements, holding the settings, random number streams, plots and checkpoints
+    # shared by all of them; SimulationFigure and the pages only use the simulations through these functions
+    # engines implement the abstract simInit, nextTimestep, getState and setState, and are added to the engines dictionary by their enginename
+
+    enginename = None           # name the engine is selected by
+    releasesgil = False         # true if most of a timestep runs without holding the GIL, so simulations can be stepped on threads together
+    fullpopulation = False      # true if the whole population of a location is simulated whatever the simulation capacity
+
+    # estimated peak memory in bytes of a simulation, as a fixed amount plus an amount for every individual and every grid location,
+    # measured with memory.py and rounded up
+    memorybase = 0
+    memoryperindividual = 0
+    memoryperlocation = 0
 
-    def __init__(self, country, disease):
+    def __init__(self, country, disease, seed=None, replicate=0, settings=None):
         self.country = country      # stores the simulation location
         self.disease = disease      # stores the simulation disease
         self.startinf = 10          # stores the number of individuals given the disease at the start of sim
@@ -46,51 +238,91 @@ class Simulation:
         self.lockdown = False             # boolean if sim is currently in lockdown
         self.lockdown_intensity = .1     # float that stores the proportion of infected needed to start lockdown
 
+        self.setSeed(seed, replicate)     # stores the seed the random number streams are created from
+        self.setTimers(False)             # the phases of each timestep are not timed unless turned on
+
+        for name, value in (settings or {}).items():
+            setattr(self, name, value)    # settings such as the preventative measures are set before the first reset, so it is the only one
+
         self.resetSim()             # resets simulation
 
+    def setSeed(self, seed=None, replicate=0):
+        # sets the seed used for the simulation, with no seed a new random seed is chosen every time the simulation is reset
+        # the replicate number gives independent runs from the same seed
+        self.userseed = seed
+        self.replicate = replicate
+
+    def setTimers(self, on=True):
+        # turns the per phase timers on or off, while on the timings of every timestep are stored in timer, which is None while off
+        self.timer = PhaseTimer() if on else None
+        self.clock = time.perf_counter if on else stoppedClock
+
+    def recordTimes(self, start, end, phases, gridtot, newcases):
+        # stores the times of the timestep just calculated, which ran from start to end with a (start, end) pair for each phase,
+        # and the number of individuals each phase went through worked out from the totals: the susceptible at the start,
+        # the infected after infection, the susceptible and infected after recovery, and everyone for the lockdown check
+        previous = self.history.data[:, self.history.length - 2]
+        agents = [int(previous[SUSCEPTIBLE]), int(previous[INFECTED]) + newcases, gridtot[SUSCEPTIBLE] + gridtot[INFECTED],
+                  sum(gridtot) if self.uselockdown else 0]
+        self.timer.record(self.timestep, end - start, [phaseend - phasestart for phasestart, phaseend in phases], agents)
+
+        if tracing.enabled:
+            tracing.complete("timestep", "simulation", start, end, timestep=self.timestep, engine=self.enginename)
+            for name, (phasestart, phaseend), count in zip(PhaseTimer.phases, phases, agents):
+                tracing.complete(name, "simulation", phasestart, phaseend, individuals=count)
+
+    def createStreams(self):
+        # creates independent random number generators for each phase of the simulation from the seed, so the same
+        # seed always gives the same run however the simulation is ran (alone, on a thread or in another process)
+        self.seed = self.userseed if self.userseed is not None else np.random.SeedSequence().entropy   # stores the seed used for this run
+        seedseq = np.random.SeedSequence(self.seed, spawn_key=(self.replicate,))
+        self.initrng, self.infectrng, self.recoverrng, self.moverng = [np.random.default_rng(s) for s in seedseq.spawn(4)]
+
     def resetSim(self):
+        self.createStreams()                 # random number streams are recreated so the run starts from the seed again
         if self.country and self.disease:    # if the simulation has a country and disease object
             self.runnable = True             # the simulation is set as runnable so can be played
-            self.simInit()                   # the simulation is initialised
+            try:
+                self.simInit()               # the simulation is initialised
+            except MemoryBudgetError:
+                self.runnable = False        # a simulation over the memory budget is left empty so it can still be shown
+                self.emptySimInit()
+                raise
+            if self.timer:
+                self.timer = PhaseTimer()    # timings of the last run are cleared
         else:                                # otherwise
             self.runnable = False            # the simulation is set as not runnable so cannot be played
             self.emptySimInit()              # an empty simulation is initialised so it works with the simulation figure
 
-    def simInit(self):
-        self.timestep = 0
-        if self.country.pop > gb.simCapacity:                                         # if the country population is over the set sim capacity
-            self.individuals = gb.simCapacity                                         # the simulation individuals is set to the capacity
-            self.gridwidth = int(math.sqrt(gb.simCapacity / self.country.density))    # the gridwidth is adjusted to match the country density
+    @classmethod
+    def populationSize(cls, country, capacity):
+        # returns the number of individuals and the grid width simulated for a country at a simulation capacity
+        if country.pop > capacity:                                              # if the country population is over the set sim capacity
+            individuals = capacity                                              # the simulation individuals is set to the capacity
+            gridwidth = max(1, int(math.sqrt(capacity / country.density)))      # the gridwidth is adjusted to match the country density
         else:
-            self.individuals = self.country.pop                                       # otherwise the individuals is kept the same
-            self.gridwidth = int(math.sqrt(self.country.area))                        # and the grid width is set to match the country area
+            individuals = country.pop                                           # otherwise the individuals is kept the same
+            gridwidth = int(math.sqrt(country.area))                            # and the grid width is set to match the country area
+        return individuals, gridwidth
 
-        self.grid = self.emptySimulationGrid()           # grid is initialised to an empty 2d numpy array
-        ips = self.individuals // (self.gridwidth**2)    # ips = Individual Per Square
-        for row in range(self.gridwidth):
-            for col in range(self.gridwidth):            # loops through every location on the grid
-                for i in range(ips):                     # appends correct amount of individual objects to the locations
-                    self.grid[row][col][0].append(Individual(self.disease.infectious))
-        for i in range(self.startinf):                   # loops through the amount of starting infected
-            r = np.random.randint(0, self.gridwidth)     # chooses a random row and column
-            c = np.random.randint(0, self.gridwidth)
-            indiv = self.grid[r][c][0].pop(0)            # removes 1 individual from the locatoin
-            indiv.infect(0)                              # infects the individual
-            self.grid[r][c][1].append(indiv)             # appends the indivual to the locations infected list
-
-        self.susplot = [ips*(self.gridwidth**2) - self.startinf]   # starting susceptible is total individuals - starting infected
-        self.infplot = [self.startinf]                             # starting infected set
-        self.recplot = [0]                                         # starting recovered set
-        self.morplot = [0]                                         # starting mortalities set
-        self.newplot = [0]                                         # starting new cases set
+    def setPopulationSize(self):
+        self.individuals, self.gridwidth = self.populationSize(self.country, gb.simCapacity)
+
+    @classmethod
+    def estimateMemory(cls, individuals, gridwidth, disease):
+        # returns the estimated peak memory in bytes of a simulation of a number of individuals of the disease on a grid of the given width
+        return cls.memorybase + cls.memoryperindividual * individuals + cls.memoryperlocation * gridwidth**2
+
+    def checkMemory(self):
+        # raises MemoryBudgetError if the simulation is estimated to use more memory than the budget, called before the population is created
+        estimate = self.estimateMemory(self.individuals, self.gridwidth, self.disease)
+        if not withinBudget(estimate):
+            raise MemoryBudgetError(f"A {self.enginename} simulation of {self.country.name} at a capacity of {gb.simCapacity} is estimated "
+                                    f"to use {estimate / 2**20:.0f} MB, over the {gb.simMemoryBudget} MB memory budget.")
 
     def emptySimInit(self):
         # initialises an empty simulation that works with a simulation figure object
-        self.susplot = [0]
-        self.infplot = [0]
-        self.recplot = [0]
-        self.morplot = [0]
-        self.newplot = [0]
+        self.history = History([0, 0, 0, 0, 0])
 
     def generateRecoveryChances(self):
         recovery_dict = {}         # dictionary to store probabilities
@@ -101,20 +333,201 @@ class Simulation:
             recovery_dict[i] = cumulative         # assigns prob to dictionary at day number (i)
         return recovery_dict
 
-    def emptySimulationGrid(self):
-        emptygrid = np.empty((self.gridwidth, self.gridwidth, 4), dtype=object)   # creates a 3d numpy array of empty objects
-        for i in np.ndindex(emptygrid.shape):   # the array is looped through
-            emptygrid[i] = []                   # each location is set to an empty list
-        return emptygrid                        # the array is returned
+    @abstractmethod
+    def simInit(self):
+        # initialises the population of the simulation and its history at timestep 0
+        pass
+
+    @abstractmethod
+    def nextTimestep(self):
+        # calculates the next timestep of the simulation and appends its totals to the history
+        pass
+
+    @abstractmethod
+    def getState(self):
+        # returns a dictionary of arrays storing the population of the simulation
+        pass
+
+    @abstractmethod
+    def setState(self, arrays):
+        # restores the population of the simulation from the arrays made by getState
+        pass
+
+    def checkLockdown(self, gridtot):
+        infected = gridtot[1]
+        if self.lockdown:                                                       # if lockdown is curretly active..
+            if (infected / sum(gridtot)) < (self.lockdown_intensity / 5):       # ..and if the proportion of infected people is less than 1/5 of the lockdown proportion..
+                self.lockdown = False                                           # ..lockdown is ended
+        else:                                                                   # if there is not curretnly lockdown..
+            if (infected / sum(gridtot)) > (self.lockdown_intensity):        # ..and if the proportion of infected people is higher than the lockdown proportion..
+                self.lockdown = True                                            # ..lockdown is started
+
+    def getGraphPlots(self, timestep):
+        # Returns the timesteps and plots for the graph up to a given timestep, as read-only views of the history
+        return self.history.getGraphPlots(timestep + 1)    # timestep is increased by 1 so it gets all needed plots including index 0
+
+    # the plots are read-only views of the history arrays
+    @property
+    def susplot(self):
+        return self.history.getPlot(0)
+
+    @property
+    def infplot(self):
+        return self.history.getPlot(1)
+
+    @property
+    def recplot(self):
+        return self.history.getPlot(2)
+
+    @property
+    def morplot(self):
+        return self.history.getPlot(3)
+
+    @property
+    def newplot(self):
+        return self.history.getPlot(4)
+
+    def setLocation(self, country):
+        # takes a disease object and stores it in simulation disease variable
+        self.country = country
+        self.resetSim()
+
+    def setDisease(self, disease):
+        # takes a disease object and stores it in simulation disease variable
+        self.disease = disease
+        self.resetSim()
+
+    # runs the simulation when simulation.py is ran by itself
+    def runSimulation(self, timesteps):
+        for t in range(timesteps):
+            self.nextTimestep()
+
+    def saveCheckpoint(self, filename):
+        # saves the full state of the simulation to an uncompressed numpy .npz file, loadCheckpoint resumes the simulation from it
+        # the arrays are stored uncompressed so they can be memory mapped when loaded
+        d = self.disease
+        meta = {"engine": self.enginename, "country": self.country.data,
+                "disease": [d.name, d.r0, d.drate, d.incubation, d.infectious, d.respiritory, d.custom, d.about, d.history],
+                **self.getMeta()}
+
+        arrays = self.getState()                  # arrays storing the engine's population
+        arrays["plots"] = self.history.getPlots()
+        arrays["meta"] = np.array(json.dumps(meta))
+        with open(filename, "wb") as f:           # file object used so numpy does not add .npz to the filename
+            np.savez(f, **arrays)
+
+    def getMeta(self):
+        # returns a dictionary of the simulation's settings, timestep and random number stream states
+        return {"timestep": self.timestep, "lockdown": self.lockdown, "individuals": self.individuals, "gridwidth": self.gridwidth,
+                "startinf": self.startinf, "vaccinated_perc": self.vaccinated_perc, "usequarantine": self.usequarantine,
+                "quarantine_lvl": self.quarantine_lvl, "uselockdown": self.uselockdown, "lockdown_intensity": self.lockdown_intensity,
+                "seed": self.seed, "userseed": self.userseed, "replicate": self.replicate,
+                "rngstates": [rng.bit_generator.state for rng in (self.initrng, self.infectrng, self.recoverrng, self.moverng)]}
+
+    def setMeta(self, meta):
+        # restores the settings, timestep and random number stream states from a dictionary made by getMeta
+        for name in ("timestep", "lockdown", "individuals", "gridwidth", "startinf", "vaccinated_perc", "usequarantine",
+                     "quarantine_lvl", "uselockdown", "lockdown_intensity", "seed", "userseed", "replicate"):
+            setattr(self, name, meta[name])
+        for rng, state in zip((self.initrng, self.infectrng, self.recoverrng, self.moverng), meta["rngstates"]):
+            rng.bit_generator.state = state           # the random number streams continue from where they were saved
+
+    def getSnapshot(self):
+        # returns a copy of the full state of the simulation kept in memory, restoreSnapshot returns the simulation to it
+        return self.getMeta(), self.copyState()
+
+    def restoreSnapshot(self, snapshot):
+        # returns the simulation to the timestep a snapshot was taken at, with the settings it had then
+        # the history after that timestep is dropped, the snapshot is copied so it can be restored again
+        meta, state = snapshot
+        self.setMeta(meta)
+        self.history.truncate(self.timestep + 1)
+        if self.timer:
+            self.timer.truncate(self.timestep + 1)
+        self.pasteState(state)
+
+    def copyState(self):
+        # returns a copy of the population kept in memory for snapshots, by default a copy of the arrays made by getState
+        return {name: np.array(array) for name, array in self.getState().items()}
+
+    def pasteState(self, state):
+        # restores the population from a copy made by copyState, leaving the copy unchanged
+        self.setState({name: np.array(array) for name, array in state.items()})
+
+
+class Simulation(Engine):
+    # reference engine, storing every individual as an Individual object in lists on each grid location
+    # the other engines are checked against it with equivalence.py
+
+    enginename = "object"       # name the engine is selected by
+    memorybase = 16 * 2**20     # random number buffers
+    memoryperindividual = 120   # a place in a list, and an Individual object once infected
+    memoryperlocation = 640     # four lists on each of the two grids
+
+    def simInit(self):
+        self.timestep = 0
+        self.setPopulationSize()                         # sets the number of individuals and the grid width
+        self.checkMemory()                               # populations estimated to be over the memory budget are refused
+
+        self.infectuniforms = RandomBuffer(self.infectrng.random)       # buffers of uniform numbers between 0 and 1 for each phase
+        self.recoveruniforms = RandomBuffer(self.recoverrng.random)
+        self.moveuniforms = RandomBuffer(self.moverng.random)
+        self.movenormals = RandomBuffer(self.moverng.standard_normal)   # buffer of standard Normal numbers for movement distances
+
+        cells = self.gridwidth**2
+        ips = self.individuals // cells                  # ips = Individual Per Square
+
+        # susceptible individuals have nothing of their own stored, so they are all the same Individual object, which is replaced
+        # by a new one when infected, and each location's list is made with its individuals instead of one individual at a time
+        self.susceptible = Individual(self.disease.infectious)
+        with gcPaused():
+            self.grid = self.emptySimulationGrid(susceptible=[self.susceptible] * ips)    # grid with ips susceptible on every location
+            self.spare = self.emptySimulationGrid(shared=self.grid)     # empty grid individuals are moved into, then swapped with the grid
+
+        # the starting infected are placed on random locations, a row and column are drawn for each in the order they were drawn
+        # one at a time, so seeded runs are unchanged; locations can not infect more individuals than they have
+        start = self.initrng.integers(0, self.gridwidth, (self.startinf, 2))
+        infected = np.minimum(np.bincount(start[:, 0] * self.gridwidth + start[:, 1], minlength=cells), ips)
+        for cell in np.flatnonzero(infected).tolist():
+            loc = self.grid[cell // self.gridwidth, cell % self.gridwidth]
+            del loc[0][:infected[cell]]                  # the starting infected are taken from the location's susceptible
+            for i in range(infected[cell]):
+                indiv = Individual(self.disease.infectious)
+                indiv.infect(0)                          # the starting infected were infected on timestep 0
+                loc[1].append(indiv)
+
+        # starting susceptible is total individuals - starting infected, with starting infected and no recovered, mortalities or new cases
+        startinf = int(infected.sum())
+        self.history = History([ips * cells - startinf, startinf, 0, 0, 0])
+
+    def emptySimulationGrid(self, shared=None, susceptible=()):
+        # returns a grid of empty lists, with a copy of susceptible as every location's susceptible list; if a grid is given to share,
+        # its recovered and mortality lists are used instead of new ones, as those individuals are never moved between the grids
+        # on wide grids making the lists is most of the time spent initialising
+        cells = self.gridwidth**2
+        emptygrid = np.empty((cells, 4), dtype=object)      # creates a numpy array of empty objects with a row for each location
+        susceptible = list(susceptible)
+        states = [1, 2, 3]
+        if shared is not None:
+            emptygrid[:, 2:] = shared.reshape(cells, 4)[:, 2:]
+            states = [1]
+        lists = emptygrid[:, 0]
+        for i in range(cells):                  # the array is looped through without the multi-dimensional indexing of np.ndindex
+            lists[i] = susceptible[:]
+        for state in states:
+            lists = emptygrid[:, state]
+            for i in range(cells):
+                lists[i] = []                   # each location is set to an empty list
+        return emptygrid.reshape(self.gridwidth, self.gridwidth, 4)     # the array is returned as a 3d grid
 
     def get_new_loc(self, r, c, movechance=0.8):
         pos = [r, c]                              # current position stored
-        if np.random.uniform(0, 1) < movechance:  # randomly decided if individual moves
-            lim = self.gridwidth                  # stores the width of the grid as the limit of movement
-            dire = np.random.randint(0, 2)        # the axis the individual moves is randomly chosen
+        if self.moveuniforms.next() < movechance:     # randomly decided if individual moves
+            lim = self.gridwidth                      # stores the width of the grid as the limit of movement
+            dire = int(self.moveuniforms.next() < 0.5)    # the axis the individual moves is randomly chosen
 
-            mean = (lim / 2) - pos[dire]          # mean is half the grid width take away the current position (individuals travel towards centre)
-            dist = np.random.normal(mean, 100)    # distance travelled decided with Normal distribution with standard deviation 100
+            mean = (lim / 2) - pos[dire]                 # mean is half the grid width take away the current position (individuals travel towards centre)
+            dist = mean + 100 * self.movenormals.next()  # distance travelled decided with Normal distribution with standard deviation 100
             new = dist + pos[dire]                # new location is calculated
             if new >= lim or new <= 0:            # if the new loc is outside limit of grid
                 dist = mean                       # the distance is set to the calculated mean
@@ -124,36 +537,44 @@ class Simulation:
         return pos[0], pos[1]                     # the new position is returned
 
     def nextTimestep(self):
+        clock = self.clock        # returns the time while the timers are on, 0 while they are off
+        start = clock()
         self.timestep += 1        # increases timestep by 1
         gridtot = [0, 0, 0, 0]    # create a list to store data for the graph  [susceptible, infected, recovered, mortalities]
         newcases = 0              # variable used to keep track of new cases for the timestep
+        infecttime = recovertime = 0    # time spent infecting and recovering, which are done together on each location
 
         for row in range(self.gridwidth):
             for col in range(self.gridwidth):
-                loc = list(self.grid[row][col])       # creates a copy of the current location
-                newloc = list(loc)                    # creates a copy that can be edited
-
-                newloc, new = self.infectGridLoc(loc, newloc)   # infects individuals
-                newloc = self.recoverGridLoc(loc, newloc)       # recovers individuals
-
-                gridtot[0] += len(newloc[0])           # adds current susceptible to the counting total
-                gridtot[1] += len(newloc[1])           # adds current infected
-                gridtot[2] += len(newloc[2])           # adds current recovered
-                gridtot[3] += len(newloc[3])           # adds current mortalities
+                loc = self.grid[row, col]             # the lists of the current location, which are edited in place
+
+                a = clock()
+                loc, new = self.infectGridLoc(loc, loc)     # infects individuals
+                b = clock()
+                loc = self.recoverGridLoc(loc, loc)         # recovers individuals
+                infecttime += b - a
+                recovertime += clock() - b
+
+                gridtot[0] += len(loc[0])              # adds current susceptible to the counting total
+                gridtot[1] += len(loc[1])              # adds current infected
+                gridtot[2] += len(loc[2])              # adds current recovered
+                gridtot[3] += len(loc[3])              # adds current mortalities
                 newcases += new                        # adds current newcases to counting total
-                self.grid[row][col] = list(newloc)     # updates the location on the grid
 
-        newgrid = self.moveIndividuals(self.grid)       # moves all individuals on the grid
-        self.grid = np.copy(newgrid)                   # updates the grid with moved individuals
+        moving = clock()
+        self.moveIndividuals(self.grid, self.spare)       # moves all individuals on the grid into the spare grid, emptying the grid
+        self.grid, self.spare = self.spare, self.grid     # the grids are swapped so the emptied grid is reused next timestep
+        moved = clock()
 
         if self.uselockdown:                  # if the user has activated lockdown for the simulation
             self.checkLockdown(gridtot)       # it is checked if the simulation should enter or end a lockdown
+        lockdown = clock()
 
-        self.susplot.append(gridtot[0])       # appends this timestep susceptible to the list of susceptible values
-        self.infplot.append(gridtot[1])       # does the same with infectious;
-        self.recplot.append(gridtot[2])       # recovered,
-        self.morplot.append(gridtot[3])       # mortalities,
-        self.newplot.append(newcases)         # newcases
+        self.history.append(gridtot + [newcases])     # stores this timestep's susceptible, infected, recovered, mortalities and new cases
+        if self.timer:
+            recovering = start + infecttime      # infecting and recovering are done in turn on each location, so are recorded one after the other
+            phases = [(start, recovering), (recovering, recovering + recovertime), (moving, moved), (moved, lockdown)]
+            self.recordTimes(start, clock(), phases, gridtot, newcases)
 
     def infectGridLoc(self, loc, newloc):
         # takes the current location on the grid, and the newloc to return the newloc with infected individuals
@@ -162,41 +583,53 @@ class Simulation:
         if self.lockdown:
             inf_chance = inf_chance / 10    # if simulation is currently in lockdown the infected chance is reduced
 
+        # chance of getting infected increased based on the number of infected on the location at the start of the timestep,
+        # so individuals infected on this location during the timestep do not infect others until the next one
+        chance = inf_chance * len(loc[1])
+        if chance == 0:
+            return newloc, 0      # locations without infected have no new cases, so no random numbers are drawn for them
+
         newcases = 0          # stores new cases for this location
-        for indiv in loc[0]:                    # loops through all susceptible individuals
-            # chance of getting infected increased based on number of infected on the location
-            if np.random.uniform(0, 1) < inf_chance * len(loc[1]):
-                newloc[0].remove(indiv)         # idividual removed from susceptible list
+        susceptible = []      # individuals left susceptible, the list is rebuilt rather than removed from while it is looped through
+        for indiv, u in zip(loc[0], self.infectuniforms.take(len(loc[0]))):    # loops through all susceptible individuals with a random number each
+            if u < chance:
+                indiv = Individual(self.disease.infectious)    # susceptible individuals share one object, so a new one is infected
                 indiv.infect(self.timestep)     # the individual is infected
                 newloc[1].append(indiv)         # added to infected list
                 newcases += 1                   # new cases increased
+            else:
+                susceptible.append(indiv)
+        newloc[0][:] = susceptible              # infected individuals are removed from the susceptible list
 
         return newloc, newcases
 
     def recoverGridLoc(self, loc, newloc):
         # takes the current location on the grid, and the newloc to return the newloc with recovered individuals
+        uniform = self.recoveruniforms.next
+        infected = []         # individuals left infected, the list is rebuilt rather than removed from while it is looped through
         for indiv in loc[1]:                                                                             # loops through all infected individuals
-            if self.usequarantine and np.random.uniform(0, 1) < self.quarantine_lvl:                     # if quarantine active, user is quarantined based on random number
-                newloc[1].remove(indiv)        # removed from infected list
-                newloc[2].append(indiv)        # added to deaths list
-            elif np.random.uniform(0, 1) < indiv.calcRecovery(self.timestep, self.recovery_dict):        # users recovery chance is calculated and compared to random number
-                newloc[1].remove(indiv)        # removed from infected list
-                if np.random.uniform(0, 1) < self.disease.drate * (1 - (self.vaccinated_perc / 2)):      # chance of the user being moved to deaths instead of recovering is calculated
+            if self.usequarantine and uniform() < self.quarantine_lvl:                                   # if quarantine active, user is quarantined based on random number
+                newloc[2].append(indiv)        # added to recovered list
+            elif uniform() < indiv.calcRecovery(self.timestep, self.recovery_dict):                      # users recovery chance is calculated and compared to random number
+                if uniform() < self.disease.drate * (1 - (self.vaccinated_perc / 2)):                    # chance of the user being moved to deaths instead of recovering is calculated
                     newloc[3].append(indiv)    # added to deaths list
                 else:
                     newloc[2].append(indiv)    # added to recovered list
+            else:
+                infected.append(indiv)
+        newloc[1][:] = infected                # recovered individuals and mortalities are removed from the infected list
         return newloc
 
-    def moveIndividuals(self, grid):
-        # takes in grid in the form of numpy array and returns new grid with moved individuals
-        newgrid = self.emptySimulationGrid()    # creates an empty numpy grid of the simulation grid size
+    def moveIndividuals(self, grid, newgrid):
+        # takes in the grid and an empty grid of the same size as numpy arrays, and moves every individual from the grid into the new grid
+        # the grid is left empty so it can be reused, and no lists are created so the only work done is for each individual
         movechance = 0.8                        # sets the default move chance
         if self.lockdown:                                          # if simulation curretnly in lockdown
             movechance = movechance * self.lockdown_intensity      # the movechance is multiplies by lockdown propotion (lowering it)
 
         for row in range(self.gridwidth):
             for col in range(self.gridwidth):
-                loc = list(self.grid[row][col])         # creates a copy of the current location
+                loc = grid[row, col]                    # the lists of the current location
 
                 for indiv in loc[0]:                                              # loops through all susceptible individuals
                     a, b = self.get_new_loc(row, col, movechance=movechance)      # gets individuals new location after moving
@@ -212,192 +645,560 @@ class Simulation:
                         a, b = self.get_new_loc(row, col, movechance=movechance)               # ..they are moved as normal
                     newgrid[a][b][1].append(indiv)                                # appends the individuals object to the new location
 
-                newgrid[row][col][2] = list(loc[2])    # the recovered individuals and mortalites are not moved as they do not affect disease spread
-                newgrid[row][col][3] = list(loc[3])    # which saves computation
+                # the recovered individuals and mortalites are not moved as they do not affect disease spread, which saves computation,
+                # so they stay in their lists, which the new grid shares
+                loc[0].clear()        # the moved individuals are cleared from the grid
+                loc[1].clear()
 
-        return newgrid       # the changed grid is returned
+    def getState(self):
+        # returns a dictionary of arrays storing every individual on the grid and the buffered random numbers
+        counts = np.zeros((self.gridwidth, self.gridwidth, 4), dtype=np.int64)    # number of individuals in each list on the grid
+        infectedat = []                                                            # infection timestep of every individual in grid order, -1 if never infected
+        for row in range(self.gridwidth):
+            for col in range(self.gridwidth):
+                for state, indivs in enumerate(self.grid[row][col]):
+                    counts[row, col, state] = len(indivs)
+                    infectedat.extend(getattr(indiv, "infectedat", -1) for indiv in indivs)
+
+        buffers = {name: np.array(buf.values[buf.index:]) for name, buf in self.getBuffers().items()}    # random numbers not used yet
+        return {"counts": counts, "infectedat": np.array(infectedat, dtype=np.int64), **buffers}
+
+    def setState(self, arrays):
+        # restores the grid of individuals and the buffered random numbers from the arrays made by getState
+        self.infectuniforms = RandomBuffer(self.infectrng.random)
+        self.recoveruniforms = RandomBuffer(self.recoverrng.random)
+        self.moveuniforms = RandomBuffer(self.moverng.random)
+        self.movenormals = RandomBuffer(self.moverng.standard_normal)
+        for name, buf in self.getBuffers().items():
+            buf.values = arrays[name].tolist()
+
+        with gcPaused():
+            self.grid = self.emptySimulationGrid()
+            self.spare = self.emptySimulationGrid(self.grid)
+        self.susceptible = Individual(self.disease.infectious)     # the object shared by every individual never infected
+        counts = arrays["counts"]
+        infectedat = iter(arrays["infectedat"].tolist())
+        for row in range(self.gridwidth):
+            for col in range(self.gridwidth):
+                for state in range(4):
+                    for i in range(counts[row, col, state]):      # individuals are recreated in the same order they were saved
+                        t = next(infectedat)
+                        if t >= 0:
+                            indiv = Individual(self.disease.infectious)
+                            indiv.infect(t)
+                        else:
+                            indiv = self.susceptible
+                        self.grid[row][col][state].append(indiv)
+
+    def copyState(self):
+        # individuals are never changed once they are created, so a snapshot only copies the lists on the grid and shares the
+        # individuals, instead of saving every individual in arrays with getState; the buffers replace their list of random numbers
+        # when they are refilled rather than changing it, so the list is shared too
+        with gcPaused():
+            grid = [list(indivs) for indivs in self.grid.ravel().tolist()]
+        return {"grid": grid, "buffers": {name: (buf.values, buf.index) for name, buf in self.getBuffers().items()}}
+
+    def pasteState(self, state):
+        # refills the lists on the grid from a copy made by copyState, the spare grid is always empty between timesteps
+        for indivs, saved in zip(self.grid.ravel().tolist(), state["grid"]):
+            indivs[:] = saved
+        for name, buf in self.getBuffers().items():
+            buf.values, buf.index = state["buffers"][name]
+
+    def getBuffers(self):
+        # returns a dictionary of the simulation's random number buffers by name
+        return {"infectuniforms": self.infectuniforms, "recoveruniforms": self.recoveruniforms,
+                "moveuniforms": self.moveuniforms, "movenormals": self.movenormals}
+
+
+class ArraySimulation(Engine):
+    # stores the population as flat numpy arrays instead of Individual objects, so each phase of a timestep
+    # is done with whole population array operations rather than looping through every individual
+
+    enginename = "array"
+    releasesgil = True      # the kernels are compiled with nogil, and numpy releases the GIL in operations on whole arrays
+    memorybase = 2**20
+    memoryperindividual = 80    # the population arrays and the temporary arrays of each phase
+    memoryperlocation = 16      # infected count of each location
+    usekernels = True           # uses the compiled kernels when numba is installed, set to False to always use the numpy operations
 
-    def checkLockdown(self, gridtot):
-        infected = gridtot[1]
-        if self.lockdown:                                                       # if lockdown is curretly active..
-            if (infected / sum(gridtot)) < (self.lockdown_intensity / 5):       # ..and if the proportion of infected people is less than 1/5 of the lockdown proportion..
-                self.lockdown = False                                           # ..lockdown is ended
-        else:                                                                   # if there is not curretnly lockdown..
-            if (infected / sum(gridtot)) > (self.lockdown_intensity):        # ..and if the proportion of infected people is higher than the lockdown proportion..
-                self.lockdown = True                                            # ..lockdown is started
+    def simInit(self):
+        self.timestep = 0
+        self.setPopulationSize()                         # sets the number of individuals and the grid width
+        self.checkMemory()                               # populations estimated to be over the memory budget are refused
+
+        cells = self.gridwidth**2
+        ips = self.individuals // cells                  # ips = Individual Per Square
+        cellid = np.repeat(np.arange(cells), ips)        # every individual is given the id of the location it starts at
+        self.row = (cellid // self.gridwidth).astype(np.int32)    # row of the grid each individual is on
+        self.col = (cellid % self.gridwidth).astype(np.int32)     # column of the grid each individual is on
+        self.state = np.full(cellid.size, SUSCEPTIBLE, dtype=np.int8)   # state of each individual (susceptible/infected/recovered/dead)
+        self.infectedat = np.zeros(cellid.size, dtype=np.int32)        # timestep each individual was infected at
+
+        # the starting infected are placed on random locations, with repeated locations infecting the next individual there
+        startcells = self.initrng.integers(0, self.gridwidth, self.startinf) * self.gridwidth + self.initrng.integers(0, self.gridwidth, self.startinf)
+        startcells = np.sort(startcells)
+        rank = np.arange(startcells.size) - np.searchsorted(startcells, startcells)   # number of earlier picks of the same location
+        startcells, rank = startcells[rank < ips], rank[rank < ips]                    # locations can not infect more individuals than they have
+        self.state[startcells * ips + rank] = INFECTED
+
+        self.recovery_table = self.generateRecoveryTable()    # array lookup of recovery chances by infection length relative to the mean
+        self.setBackend()
+
+        counts = np.bincount(self.state, minlength=4)
+        self.history = History([int(counts[SUSCEPTIBLE]), int(counts[INFECTED]), 0, 0, 0])    # starting plots
+
+    def getState(self):
+        # returns a dictionary of the population arrays
+        return {"row": self.row, "col": self.col, "state": self.state, "infectedat": self.infectedat}
+
+    def setState(self, arrays):
+        # restores the population arrays made by getState
+        self.row, self.col, self.state, self.infectedat = arrays["row"], arrays["col"], arrays["state"], arrays["infectedat"]
+        self.recovery_table = self.generateRecoveryTable()
+        self.setBackend()
+
+    def setBackend(self):
+        # chooses between the compiled kernels and the numpy operations, backend stores the name of the one used
+        self.kernels = loadKernels() if self.usekernels else None
+        self.backend = "numba" if self.kernels else "numpy"
+
+    def generateRecoveryTable(self):
+        # turns the recovery dictionary into an array indexed by (relative infection length + 10), matching Individual.calcRecovery
+        return np.array([self.recovery_dict.get(i, 0) for i in range(-10, 11)])
+
+    def recoveryChances(self, infectionlen):
+        # takes an array of infection lengths and returns the chance of recovery for each one
+        relative = infectionlen - self.disease.infectious                        # infection length relative to the mean length
+        chances = self.recovery_table[np.clip(relative, -10, 10) + 10]           # chance looked up from the table
+        chances[relative < -10] = 0                                              # lengths far before the mean never recover
+        chances[relative > 10] = 1                                               # and lengths far past the mean always recover
+        return chances
 
-    def getGraphPlots(self, timestep):
-        # Returns the plots for the graph up to a given timestep
-        timestep += 1                                  # timestep is increased by 1 so it gets all needed plots in the list including index 0
-        plots = []
-        plots.append(self.susplot[:timestep])
-        plots.append(self.infplot[:timestep])
-        plots.append(self.recplot[:timestep])
-        plots.append(self.morplot[:timestep])
-        plots.append(self.newplot[:timestep])
-        return [i for i in range(timestep)], plots     # returns timesteps and plots
+    def nextTimestep(self):
+        clock = self.clock        # returns the time while the timers are on, 0 while they are off
+        start = clock()
+        self.timestep += 1        # increases timestep by 1
 
-    def setLocation(self, country):
-        # takes a disease object and stores it in simulation disease variable
-        self.country = country
-        self.resetSim()
+        newcases = self.infectPopulation()            # infects individuals
+        infected = clock()
+        self.recoverPopulation()                      # recovers individuals
+        recovered = clock()
+        gridtot = np.bincount(self.state, minlength=4).tolist()   # [susceptible, infected, recovered, mortalities] totals for the graph
 
-    def setDisease(self, disease):
-        # takes a disease object and stores it in simulation disease variable
-        self.disease = disease
-        self.resetSim()
+        moving = clock()
+        self.movePopulation()                         # moves all individuals on the grid
+        moved = clock()
 
-    # runs the simulation when simulation.py is ran by itself
-    def runSimulation(self, timesteps):
-        for t in range(timesteps):
-            self.nextTimestep()
+        if self.uselockdown:                  # if the user has activated lockdown for the simulation
+            self.checkLockdown(gridtot)       # it is checked if the simulation should enter or end a lockdown
+        lockdown = clock()
 
-    # plots the graph when the simulation.py is ran by itself
-    def plotSingleGraph(self):
-        xaxis = [i for i in range(self.timestep+1)]
-        plt.plot(xaxis, self.infplot, label="infected")
-        plt.plot(xaxis, self.morplot, label="deceased")
-        plt.bar(xaxis, self.newplot, label="new cases", width=1)
-        plt.xlabel("timestep")
-        plt.ylabel("population")
-        plt.title("disease spread")
-        plt.xlim((0, self.timestep))
+        self.history.append(gridtot + [newcases])     # stores this timestep's susceptible, infected, recovered, mortalities and new cases
+        if self.timer:
+            phases = [(start, infected), (infected, recovered), (moving, moved), (moved, lockdown)]
+            self.recordTimes(start, clock(), phases, gridtot, newcases)
 
-        print("Most new cases in a day: " + str(sorted(self.newplot)[-1]))
-        print("Amount of people infected: " + str(self.individuals-self.susplot[-1]))
-        print("Total deaths: " + str(self.morplot[-1]))
+    def infectPopulation(self):
+        # infects susceptible individuals based on the number of infected on their location, returns the number of new cases
+        inf_chance = 0.00004 * self.disease.r0 * (1 - self.vaccinated_perc**2)
+        if self.lockdown:
+            inf_chance = inf_chance / 10    # if simulation is currently in lockdown the infected chance is reduced
 
-        plt.show()
+        if self.kernels:
+            infcount, exposed = self.kernels.infectionPressure(self.row, self.col, self.state, self.gridwidth)
+            uniforms = self.infectrng.random(exposed)
+            return self.kernels.infect(self.row, self.col, self.state, self.infectedat, infcount, self.gridwidth, inf_chance, uniforms, self.timestep)
+
+        cellid = self.row * self.gridwidth + self.col
+        infcount = np.bincount(cellid[self.state == INFECTED], minlength=self.gridwidth**2)   # number of infected on each location
+
+        sus = np.flatnonzero(self.state == SUSCEPTIBLE)
+        sus = sus[infcount[cellid[sus]] > 0]          # only susceptible individuals sharing a location with an infected can be infected
+        chance = inf_chance * infcount[cellid[sus]]   # chance of getting infected increased based on number of infected on the location
+        newinf = sus[self.infectrng.random(sus.size) < chance]
+
+        self.state[newinf] = INFECTED                 # the individuals are infected
+        self.infectedat[newinf] = self.timestep       # and their timestep of infection saved
+        return newinf.size
+
+    def recoverPopulation(self):
+        # recovers infected individuals, or moves them to deaths, based on their infection length
+        deathchance = self.disease.drate * (1 - (self.vaccinated_perc / 2))       # chance of dying instead of recovering
+        if self.kernels:
+            remaining = np.count_nonzero(self.state == INFECTED)
+            if self.usequarantine:
+                remaining = self.kernels.quarantine(self.state, self.recoverrng.random(remaining), self.quarantine_lvl)
+            recovered = np.empty(remaining, dtype=np.int64)
+            count = self.kernels.recover(self.state, self.infectedat, self.recoverrng.random(remaining), self.recovery_table,
+                                         self.disease.infectious, self.timestep, recovered)
+            self.kernels.die(self.state, recovered[:count], self.recoverrng.random(count), deathchance)
+            return
+
+        inf = np.flatnonzero(self.state == INFECTED)
+        if self.usequarantine:
+            quarantined = self.recoverrng.random(inf.size) < self.quarantine_lvl       # if quarantine active, individuals are quarantined based on random number
+            self.state[inf[quarantined]] = RECOVERED     # quarantined individuals are removed as recovered
+            inf = inf[~quarantined]
+
+        chance = self.recoveryChances(self.timestep - self.infectedat[inf])
+        recovered = inf[self.recoverrng.random(inf.size) < chance]
+        dies = self.recoverrng.random(recovered.size) < deathchance
+        self.state[recovered[dies]] = DEAD
+        self.state[recovered[~dies]] = RECOVERED
+
+    def movePopulation(self):
+        # moves susceptible and infected individuals on the grid in the same way as get_new_loc
+        movechance = 0.8                                           # sets the default move chance
+        if self.lockdown:                                          # if simulation curretnly in lockdown
+            movechance = movechance * self.lockdown_intensity      # the movechance is multiplies by lockdown propotion (lowering it)
 
+        if self.usequarantine:
+            infectedchance = movechance / (10 * self.quarantine_lvl)    # infected individuals move less based on the quarantine level
+        else:
+            infectedchance = movechance * (3 / 4)                       # or at a reduced chance with no quarantine
+
+        if self.kernels:
+            mobile = np.count_nonzero(self.state <= INFECTED)
+            movers = np.empty(mobile, dtype=np.int64)
+            count = self.kernels.chooseMovers(self.state, self.infectedat, self.moverng.random(mobile), movechance, infectedchance,
+                                              self.disease.incubation, self.timestep, movers)
+            axes = self.moverng.integers(0, 2, count)                   # drawn in the same order as the numpy operations below
+            self.kernels.move(self.row, self.col, movers[:count], axes, self.moverng.standard_normal(count), self.gridwidth)
+            return
+
+        mobile = np.flatnonzero(self.state <= INFECTED)           # recovered individuals and mortalities are not moved
+        chance = np.full(mobile.size, movechance)
+        pastincubation = (self.state[mobile] == INFECTED) & (self.timestep - self.infectedat[mobile] > self.disease.incubation)
+        chance[pastincubation] = infectedchance
+
+        movers = mobile[self.moverng.random(mobile.size) < chance]
+        onrow = self.moverng.integers(0, 2, movers.size) == 0        # the axis each individual moves along is randomly chosen
+        pos = np.where(onrow, self.row[movers], self.col[movers])
+
+        mean = (self.gridwidth / 2) - pos                           # individuals travel towards the centre
+        dist = self.moverng.normal(mean, 100)                       # distance travelled decided with Normal distribution with standard deviation 100
+        new = dist + pos
+        dist = np.where((new >= self.gridwidth) | (new <= 0), mean, dist)    # distances that leave the grid are set to the mean
+        pos = pos + dist.astype(np.int32)                           # travelled distance is added to the position, truncated like int()
+
+        self.row[movers[onrow]] = pos[onrow]
+        self.col[movers[~onrow]] = pos[~onrow]
+
+
+class CompartmentSimulation(Engine):
+    # simulates the full population of the location by storing counts of individuals on each grid location instead of
+    # individuals themselves, infected are counted by their infection length so the cost depends on the grid size not the population
+
+    enginename = "compartment"
+    fullpopulation = True   # so its results are not comparable with the other engines' on locations over the simulation capacity
+    maxgridwidth = 100      # largest grid width used, larger locations have more than 1 km^2 on each grid location
+    memorybase = 2**20
+    memoryperindividual = 0     # individuals are only counted
+    memoryperlocation = 64      # susceptible, recovered and mortality counts
+    memoryperlayer = 24         # infected count of every infection length on each location, and the temporary arrays made from it
 
-class SimulationFigure:
+    def simInit(self):
+        self.timestep = 0
+        self.setPopulationSize()                         # sets the number of individuals and the grid width
+        self.checkMemory()                               # populations estimated to be over the memory budget are refused
+
+        cells = self.gridwidth**2
+        counts = np.full(cells, self.individuals // cells, dtype=np.int64)   # individuals are spread evenly over the locations
+        counts[:self.individuals % cells] += 1                               # with the remainder on the first locations
+        self.sus = counts.reshape(self.gridwidth, self.gridwidth)            # susceptible count on each location
+        self.rec = np.zeros_like(self.sus)                                   # recovered count on each location
+        self.mor = np.zeros_like(self.sus)                                   # mortality count on each location
+
+        self.generateTables()                            # lookup tables for recovery and movement chances
+        # infected count on each location for every infection length, up to the length where every infected has recovered
+        self.inf = np.zeros((self.maxinfectionlen + 1, self.gridwidth, self.gridwidth), dtype=np.int64)
+
+        startcells = self.initrng.integers(0, self.gridwidth, self.startinf) * self.gridwidth + self.initrng.integers(0, self.gridwidth, self.startinf)
+        start = np.minimum(np.bincount(startcells, minlength=cells), counts).reshape(self.gridwidth, self.gridwidth)
+        self.sus -= start                                # starting infected are taken from the susceptible on random locations
+        self.inf[0] += start
+
+        self.history = History([int(self.sus.sum()), int(self.inf.sum()), 0, 0, 0])    # starting plots
+
+    @classmethod
+    def estimateMemory(cls, individuals, gridwidth, disease):
+        # infected are counted for every infection length up to the length where all have recovered, so memory grows with the infectious period
+        layers = disease.infectious + 12
+        return super().estimateMemory(individuals, gridwidth, disease) + cls.memoryperlayer * layers * gridwidth**2
+
+    def generateTables(self):
+        self.maxinfectionlen = self.disease.infectious + 11     # infection length where every infected has recovered
+        self.recovery_chances = np.array([min(self.calcRecoveryChance(i), 1) for i in range(self.maxinfectionlen + 1)])   # recovery chance for each infection length
+        self.generateMoveChances()                               # chances of where individuals land after moving along an axis
+
+    def getState(self):
+        # returns a dictionary of the count arrays
+        return {"sus": self.sus, "inf": self.inf, "rec": self.rec, "mor": self.mor}
+
+    def setState(self, arrays):
+        # restores the count arrays made by getState
+        self.sus, self.inf, self.rec, self.mor = arrays["sus"], arrays["inf"], arrays["rec"], arrays["mor"]
+        self.cellarea = self.country.area / self.gridwidth**2
+        self.generateTables()
+
+    @classmethod
+    def populationSize(cls, country, capacity):
+        # the whole population is simulated whatever the capacity, with the grid width matching the area up to the max width
+        return country.pop, max(1, min(int(math.sqrt(country.area)), cls.maxgridwidth))
+
+    def setPopulationSize(self):
+        super().setPopulationSize()
+        self.cellarea = self.country.area / self.gridwidth**2      # area in km^2 covered by each grid location
+
+    def calcRecoveryChance(self, infectionlen):
+        # returns the chance of recovery for the given infection length in the same way as Individual.calcRecovery
+        infectcur = infectionlen - self.disease.infectious
+        try:
+            return self.recovery_dict[infectcur]
+        except KeyError:
+            if infectcur > 10:
+                return 1
+            return 0
 
-    def __init__(self, ctrl, simulation):
-        self.ctrl = ctrl                   # the page the figure is going on
-        self.simulation = simulation       # the simulatin object of the figure
+    def generateMoveChances(self):
+        # moving individuals travel towards the centre with a Normal distributed distance in the same way as get_new_loc, so the
+        # landing point does not depend on where they started; a landing point outside of the grid moves them to the centre,
+        # otherwise the distance is truncated towards zero, so they land on the grid line below the landing point when it is
+        # after where they started, and on the one above it when it is before
+        lim = self.gridwidth
+        sd = 100 / math.sqrt(self.cellarea)       # standard deviation of 100 km converted to grid locations
+        cdf = np.array([0.5 * (1 + math.erf((x - lim / 2) / (sd * math.sqrt(2)))) for x in range(lim + 1)])   # Normal cdf at each grid line
+        inside = cdf[-1] - cdf[0]
+        chances = np.diff(cdf)                                # chance of landing between each pair of grid lines
+        self.outside_chance = 1 - inside                      # chance of landing outside of the grid
+        self.centres = np.arange(lim) + (lim / 2 - np.arange(lim)).astype(int)    # where each row/column moves to from outside
+        self.before_chances = (cdf[:-1] - cdf[0]) / inside      # chance of landing before each row/column when landing on the grid
+        # chance of landing between each pair of grid lines for individuals not landing before them, going forward through the grid,
+        # and not landing after them, going back through it; these are 1 where nobody is left to land further on
+        self.forward_chances = np.minimum(np.divide(chances, cdf[-1] - cdf[:-1], out=np.ones(lim), where=cdf[-1] > cdf[:-1]), 1)
+        self.back_chances = np.minimum(np.divide(chances, cdf[1:] - cdf[0], out=np.ones(lim), where=cdf[1:] > cdf[0]), 1)
 
-        self.loadedTimesteps = 1
-        self.uselegend = True
+    def nextTimestep(self):
+        clock = self.clock        # returns the time while the timers are on, 0 while they are off
+        start = clock()
+        self.timestep += 1        # increases timestep by 1
 
-        self.linefigure = Figure(figsize=(5, 4), dpi=100)                                                   # creates a matplotlib figure of deafult size
-        self.linefigure.subplots_adjust(left=0.12, right=0.94, top=0.975, bottom=0.08, wspace=0, hspace=0)  # removes the white space around the figure
+        self.inf = np.roll(self.inf, 1, axis=0)     # every infected individual has been infected for one more timestep
+        self.inf[0] = 0                             # the longest infection length is always fully recovered so nobody wraps around
 
-        self.figplot = self.linefigure.add_subplot(111)                        # creates a plot on the figure
-        susplot, = self.figplot.plot(([0], simulation.susplot), "blue")        # plots the simulation values onto the plot
-        infplot, = self.figplot.plot(([0], simulation.infplot), "red")
-        recplot, = self.figplot.plot(([0], simulation.recplot), "green")
-        morplot, = self.figplot.plot(([0], simulation.morplot), "black")
-        newplot, = self.figplot.plot(([0], simulation.newplot), "purple")
-        self.plotlist = [susplot, infplot, recplot, morplot, newplot]        # stores the plots in list for accessibility and editing
-        self.plotname = ["Sus", "Inf", "Rec", "Dead", "New"]                 # stores associated names for the plots for use in legend
-        self.vislist = [0, 1, 0, 0, 1]                                       # stores associated boolean values for if the plot is visible
+        newcases = self.infectLocations()           # infects individuals
+        infected = clock()
+        self.recoverLocations()                     # recovers individuals
+        recovered = clock()
+        gridtot = [int(self.sus.sum()), int(self.inf.sum()), int(self.rec.sum()), int(self.mor.sum())]   # totals for the graph
 
-        self.updateLegend()
-        self.updateGraph()
+        moving = clock()
+        self.moveLocations()                        # moves individuals between locations
+        moved = clock()
 
-    def getFigure(self):
-        return self.linefigure        # returns the figure for use in DrawableCanvas objects
+        if self.uselockdown:                  # if the user has activated lockdown for the simulation
+            self.checkLockdown(gridtot)       # it is checked if the simulation should enter or end a lockdown
+        lockdown = clock()
 
-    def getMaxPoint(self):
-        maxplot = 0
-        for i in range(len(self.vislist)):           # loops through the range of plots
-            if self.vislist[i] and max(self.values[i][:self.ctrl.currentTime+1]) > maxplot:   # if the plot is visible and its max is bigger than current max
-                maxplot = max(self.values[i])                                                 # the max is set to the plot max
+        self.history.append(gridtot + [newcases])     # stores this timestep's susceptible, infected, recovered, mortalities and new cases
+        if self.timer:
+            phases = [(start, infected), (infected, recovered), (moving, moved), (moved, lockdown)]
+            self.recordTimes(start, clock(), phases, gridtot, newcases)
 
-        if maxplot < 46:
-            return 50                      # minimum y axis limit is 50
+    def infectLocations(self):
+        # infects susceptible individuals on each location with a binomial draw, returns the number of new cases
+        inf_chance = 0.00004 * self.disease.r0 * (1 - self.vaccinated_perc**2)
+        if self.lockdown:
+            inf_chance = inf_chance / 10    # if simulation is currently in lockdown the infected chance is reduced
+
+        density = self.inf.sum(axis=0) / self.cellarea          # infected per km^2 on each location
+        new = self.infectrng.binomial(self.sus, np.minimum(inf_chance * density, 1))
+        self.sus -= new
+        self.inf[0] += new                                       # new cases have an infection length of 0
+        return int(new.sum())
+
+    def recoverLocations(self):
+        # recovers infected individuals, or moves them to deaths, with binomial draws for each infection length
+        if self.usequarantine:
+            quarantined = self.recoverrng.binomial(self.inf, self.quarantine_lvl)   # quarantined individuals are removed as recovered
+            self.inf -= quarantined
+            self.rec += quarantined.sum(axis=0)
+
+        recovered = self.recoverrng.binomial(self.inf, self.recovery_chances[:, None, None])
+        self.inf -= recovered
+        recovered = recovered.sum(axis=0)
+        dead = self.recoverrng.binomial(recovered, self.disease.drate * (1 - (self.vaccinated_perc / 2)))   # chance of dying instead of recovering
+        self.mor += dead
+        self.rec += recovered - dead
+
+    def moveLocations(self):
+        # moves susceptible and infected individuals between locations in the same way as get_new_loc
+        movechance = 0.8                                           # sets the default move chance
+        if self.lockdown:                                          # if simulation curretnly in lockdown
+            movechance = movechance * self.lockdown_intensity      # the movechance is multiplies by lockdown propotion (lowering it)
+
+        if self.usequarantine:
+            infmovechance = movechance / (10 * self.quarantine_lvl)    # infected individuals out of incubation move less based on the quarantine level
         else:
-            return int(maxplot * 1.1)      # y axis max is set higher to leave room between top of the graph and figure
-
-    def getVisiblePlots(self):
-        plotli, nameli = [], []
-        for i in range(len(self.plotlist)):          # loops through figure plots
-            if self.vislist[i]:
-                plotli.append(self.plotlist[i])      # for every plot that is visible, it is appended to the plot list
-                nameli.append(self.plotname[i])      # and its name appended to the name list
-        return plotli, nameli
-
-    def updateLegend(self):
-        if not self.uselegend:     # if the figure is selected to not be shown
-            self.leg.remove()      # the legend is removed and the function returns
-            return 0
-        p, n = self.getVisiblePlots()     # gets a list of visible figure plots and a list of corresponding names for the legend
-        if len(p) > 0:
-            # if there is more than one visible plot, the legend is set in the top left
-            self.leg = self.figplot.legend(p, n, loc="upper left", fancybox=False)
-
-    def setVisible(self, vis):
-        # takes a list of boolean values that decide visibility
-        self.vislist = vis
-        self.updateLegend()
-
-    def configLimit(self, limit):
-        # takes a limit for the y axis and sets the figures y axis limit to that, used for scaling graphs
-        self.figplot.set_ylim(0, limit)
-        self.updateGraph()
-        self.updateLegend()
-
-    def setSim(self, simulation):
-        # takes a simulation object and sets the figure's simulation to that object, then resets the figure/sim
-        self.simulation = simulation
-        self.resetSim()
+            infmovechance = movechance * (3 / 4)                       # or at a reduced chance with no quarantine
+
+        # the susceptible count and the infected count of every infection length are moved together, each with its move chance
+        counts = np.concatenate([self.sus[None], self.inf])
+        chances = np.full(len(counts), min(movechance, 1))
+        chances[self.disease.incubation + 2:] = min(infmovechance, 1)     # infection lengths out of the incubation period
+        layers = np.flatnonzero(counts.any(axis=(1, 2)))        # counts with nobody in them are skipped, so no random numbers are drawn for them
+
+        movers = self.moverng.binomial(counts[layers], chances[layers, None, None])
+        rowmovers = self.moverng.binomial(movers, 0.5)                 # half move along rows, the other half along columns
+        colmovers = movers - rowmovers
+        # movers along columns are transposed so both move along the second axis, with the same random draws for both
+        landed = self.moveAlongAxis(np.concatenate([rowmovers, colmovers.transpose(0, 2, 1)]))
+        counts[layers] += landed[:len(layers)] + landed[len(layers):].transpose(0, 2, 1) - movers
+        self.sus, self.inf = counts[0], counts[1:]
+
+    def moveAlongAxis(self, movers):
+        # takes counts of movers on each row of each column and returns the counts on the rows they land on
+        # a count for each row is drawn in turn from the movers left for every column at once, so the draws do not depend on the population
+        outside = self.moverng.binomial(movers, self.outside_chance)
+        inside = movers - outside
+        back = self.moverng.binomial(inside, self.before_chances[:, None])     # movers landing before the row they started on
+        forward = inside - back
+
+        landed = np.zeros_like(movers)
+        for centre in np.unique(self.centres):        # movers landing outside of the grid go to the centre
+            landed[:, centre] += outside[:, self.centres == centre].sum(axis=1)
+
+        left = np.zeros_like(movers[:, 0])            # movers left to land for each column
+        for row in range(self.gridwidth):             # movers going forward can land on the row they started on or after it
+            left += forward[:, row]
+            landing = self.moverng.binomial(left, self.forward_chances[row])
+            landed[:, row] += landing
+            left -= landing
+        for row in range(self.gridwidth - 2, -1, -1):   # movers going back land on the row after the grid line below the landing point
+            left += back[:, row + 1]
+            landing = self.moverng.binomial(left, self.back_chances[row])
+            landed[:, row + 1] += landing
+            left -= landing
+        return landed
+
+
+engines = {"object": Simulation, "array": ArraySimulation, "compartment": CompartmentSimulation}    # simulation engines that can be selected by name
+
+
+def loadKernels():
+    # returns the compiled kernels used by the array engine, or None if numba is not installed so the numpy operations are used
+    try:
+        import kernels          # only imported when an array simulation is created, as importing numba is slow
+    except ImportError:
+        return None
+    return kernels
+
+
+def mapArrays(filename):
+    # returns a dictionary of the arrays in an uncompressed .npz file, memory mapped so they are read from the file only when used
+    # the maps are copy-on-write, so changing the arrays never changes the file
+    arrays = {}
+    with open(filename, "rb") as f, zipfile.ZipFile(f) as zf:
+        for info in zf.infolist():
+            name = info.filename[:-4]                     # removes '.npy' from the array name
+            f.seek(info.header_offset + 26)
+            namelen, extralen = struct.unpack("<HH", f.read(4))     # lengths of the variable fields of the zip local file header
+            f.seek(info.header_offset + 30 + namelen + extralen)    # position the .npy file starts in the .npz file
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
 
-    def resetSim(self):
-        self.simulation.resetSim()
-        self.loadedTimesteps = 1
-        self.updateGraph()
+            if info.compress_type != zipfile.ZIP_STORED or dtype.hasobject or 0 in shape or not shape:
+                with zf.open(info) as member:
+                    arrays[name] = np.load(member)        # arrays that can not be mapped are read normally
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode="c", offset=f.tell(), shape=shape, order="F" if fortran else "C")
+    return arrays
 
-    def nextTimestep(self):
-        # when the currently displayed timestep is the same or more than the amount of loaded timesteps, the next timestep must be loaded
-        # if the currently displayed timestep is lower than the loaded timesteps the next timestep is not unecessarily loaded
-        if len(self.values[0]) >= self.loadedTimesteps:
-            self.simulation.nextTimestep()
-            self.loadedTimesteps += 1
 
-    def updateGraph(self):
-        self.xplot, self.values = self.simulation.getGraphPlots(self.ctrl.currentTime)   # gets timesteps and simulation plots up to the current timestep
+def loadCheckpoint(filename):
+    # creates a simulation from a file made by saveCheckpoint, running it continues exactly as the saved simulation would have
+    arrays = mapArrays(filename)
+    meta = json.loads(str(arrays.pop("meta")))
 
-        if len(self.xplot) > 1:
-            self.figplot.set_xlim(0, self.xplot[-1])     # sets the x limit of the graph to between 0 and current timestep
-        else:
-            self.figplot.set_xlim(0, 1)                  # if the current timestep is 0, the x axis is set between 0 and 1
+    simulation = engines[meta["engine"]](None, None)       # created empty so the population is not initialised before it is replaced
+    simulation.country = gb.Country(meta["country"])
+    simulation.disease = gb.Disease(meta["disease"])
+    simulation.setMeta(meta)
+    simulation.runnable = True
+
+    simulation.history = History(arrays.pop("plots"))
+    simulation.setState(arrays)
+    return simulation
 
-        for i, plot in enumerate(self.plotlist):    # loops through figure plots with i storing its index in the list of plots
-            values = self.values[i]                 # gets the simulation values for the current figure plot
-            plot.set_data(self.xplot, values)       # plots to values to the figure
-            if self.vislist[i]:
-                plot.set_linestyle("-")             # if the current figure plot is selected to be visible, its linestyle is turned on
-            else:
-                plot.set_linestyle("none")          # otherwise its linestyle is set to none
 
+def withinBudget(memory):
+    # returns true if an amount of memory in bytes is within the memory budget, or there is no budget
+    return gb.simMemoryBudget is None or memory <= gb.simMemoryBudget * 2**20
 
-class DrawableCanvas:
 
-    def __init__(self, master, figure, figsize):
-        # function takes the frame it will be placed, the SimulationFigure object, and the desired figure size as a list
-        self.figwidth = figsize[0]
-        self.figheight = figsize[1]
-        self.figure = figure.getFigure()
+def estimateMemory(country, disease, engine=None, capacity=None):
+    # returns the estimated peak memory in bytes of a simulation of the country and disease with the named engine at the capacity,
+    # or the engine and capacity selected in the settings if they are not given
+    engineclass = engines[engine or gb.simEngine]
+    return engineclass.estimateMemory(*engineclass.populationSize(country, capacity or gb.simCapacity), disease)
 
-        self.figure.set_figwidth(self.figwidth)
-        self.figure.set_figheight(self.figheight)
 
-        self.canvas = FigureCanvasTkAgg(self.figure, master=master)   # creates a tkinter canvas that can display matplotlib figures
-        self.canvas.draw()
+def leanerEngine(country, disease, engine=None, capacity=None):
+    # returns the name of the first engine after the named engine that is estimated to be within the memory budget, or None
+    # the engines dictionary is ordered from the most memory for each individual to the least
+    names = list(engines)
+    for name in names[names.index(engine or gb.simEngine) + 1:]:
+        if withinBudget(estimateMemory(country, disease, name, capacity)):
+            return name
+    return None
 
-    def getCanvas(self):
-        return self.canvas.get_tk_widget()     # returns the canvas widget allowing it to be placed in a tkinter frame
 
-    def draw(self):
-        self.figure.set_figwidth(self.figwidth)      # dynamically updates the figure size allowing multiple sizes
-        self.figure.set_figheight(self.figheight)    # of the same canvas object to be placed on different displays tabs
-        self.canvas.draw()
+def createSimulation(country, disease, engine=None, seed=None, replicate=0, settings=None, fallback=None):
+    # creates a simulation object using the named engine, or the engine selected in the settings if no name is given
+    # settings is a dictionary of simulation attributes set before it is initialised, e.g. {"vaccinated_perc": 0.5}
+    # simulations estimated to be over the memory budget use a leaner engine that is within it if fallback is true, or
+    # gb.simMemoryFallback is set when it is not given, otherwise simInit raises MemoryBudgetError
+    engine = engine or gb.simEngine
+    fallback = gb.simMemoryFallback if fallback is None else fallback
+    if country and disease and fallback and not withinBudget(estimateMemory(country, disease, engine)):
+        leaner = leanerEngine(country, disease, engine)
+        if leaner:
+            warnings.warn(f"a {engine} simulation of {country.name} is over the {gb.simMemoryBudget} MB memory budget, the {leaner} engine is used"
+                          + (", which simulates the whole population" if engines[leaner].fullpopulation else ""))
+            engine = leaner
+    return engines[engine](country, disease, seed=seed, replicate=replicate, settings=settings)
 
 
 if __name__ == "__main__":
     # sets up a simulation to run when 'simulation.py' is ran by itself to allow for easier testing of its functions
-    country = gb.Country(["Country", "Null", "None", 10000, 100, 10])
-    disease = gb.Disease(["COVID-19", 2.8, 0.006, 5, 9, 1, 0, "No Information", "No Information"])
-    sim = Simulation(country, disease)   # creates a simulation object with defined country and disease
-    sim.runSimulation(100)               # runs 100 timesteps of the simulation
-    sim.plotSingleGraph()                # displays the graph of the simulation
+    # its graph is displayed, or with --profile the run is profiled and the hottest functions and sampled stacks are written
+    import argparse
+    parser = argparse.ArgumentParser(description="Runs a simulation and displays its graph, or profiles the run.")
+    parser.add_argument("-e", "--engine", choices=list(engines), default="object", help="simulation engine (default object)")
+    parser.add_argument("-c", "--capacity", type=int, default=gb.simCapacity, help=f"simulation capacity (default {gb.simCapacity})")
+    parser.add_argument("-n", "--steps", type=int, default=100, help="number of timesteps to simulate (default 100)")
+    parser.add_argument("-l", "--location", help="location simulated (default a test country of 10000 people on 100 km^2)")
+    parser.add_argument("-d", "--disease", default="COVID-19", help="disease simulated (default COVID-19)")
+    parser.add_argument("-s", "--seed", type=int, help="seed of the simulation")
+    parser.add_argument("--profile", metavar="PREFIX", help="profiles the run, writing a report to PREFIX.txt and collapsed stacks to PREFIX.folded")
+    parser.add_argument("--interval", type=float, default=0.001, help="seconds between stack samples when profiling (default 0.001)")
+    args = parser.parse_args()
+
+    gb.simCapacity = args.capacity
+    country = gb.loadLocations()[args.location] if args.location else gb.Country(["Country", "Null", "None", 10000, 100, 10])
+    disease = gb.loadDiseases()[args.disease]
+    sim = createSimulation(country, disease, args.engine, args.seed)   # creates a simulation object with the chosen country and disease
+
+    if args.profile:
+        import profiling                     # the profilers are only imported when profiling
+        for filename in profiling.profileSimulation(sim, args.steps, args.profile, args.interval):
+            print("Wrote " + filename)
+    else:
+        sim.runSimulation(args.steps)        # runs the timesteps of the simulation
+
+        import simfigure                     # the plotting module is only imported when a graph is shown
+        simfigure.plotSingleGraph(sim)       # displays the graph of the simulation
@@ -0,0 +1,86 @@
+import globalvars as gb     # global variables
+from ensemble import runReplicate    # runs a single simulation and returns its plots
+
+import numpy as np
+import os
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor    # runs sweep points across a pool of worker processes
+
+
+def pointSettings(vaccinated_perc, quarantine_lvl, lockdown_intensity):
+    # returns the simulation settings for one point of the sweep, a level of None turns that measure off
+    settings = {"vaccinated_perc": vaccinated_perc, "usequarantine": quarantine_lvl is not None, "uselockdown": lockdown_intensity is not None}
+    if quarantine_lvl is not None:
+        settings["quarantine_lvl"] = quarantine_lvl
+    if lockdown_intensity is not None:
+        settings["lockdown_intensity"] = lockdown_intensity
+    return settings
+
+
+def pointKey(scenario, point):
+    # returns the name a sweep point is stored under in the cache file, the levels are turned into floats so numpy
+    # and python numbers of the same value give the same name
+    levels = tuple(None if v is None else float(v) for v in point)
+    return hashlib.sha1((scenario + "|" + repr(levels)).encode()).hexdigest()
+
+
+def loadCache(cachefile):
+    # returns a dictionary of the plots stored in a cache file, or an empty dictionary if there is no file
+    if not cachefile or not os.path.exists(cachefile):
+        return {}
+    with np.load(cachefile) as data:
+        return {key: data[key] for key in data.files}
+
+
+def runSweep(country, disease, timesteps, vaccinated=(0,), quarantine=(None,), lockdown=(None,), engine=None, seed=0, workers=None, cachefile=None):
+    # runs every combination of the given vaccination percentages, quarantine levels and lockdown intensities on a process pool
+    # returns a structured array of shape (len(vaccinated), len(quarantine), len(lockdown)) holding each point's parameters and plots,
+    # measures turned off with None are stored as nan; every point uses the same seed so they only differ by their settings
+    # points already stored in the cache file are not ran again, and newly ran points are added to it
+    engine = engine or gb.simEngine
+    scenario = "|".join(str(v) for v in (country.name, country.pop, country.area, disease.name, disease.r0, disease.drate,
+                                         disease.incubation, disease.infectious, engine, seed, gb.simCapacity, timesteps))
+    cache = loadCache(cachefile)
+
+    points = list(itertools.product(vaccinated, quarantine, lockdown))
+    torun = [p for p in points if pointKey(scenario, p) not in cache]
+    args = [(country, disease, timesteps, seed, 0, engine, pointSettings(*p), gb.simCapacity) for p in torun]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(args)))
+    if workers == 1:
+        runs = [runReplicate(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            runs = list(pool.map(runReplicate, *zip(*args)))
+    for p, plots in zip(torun, runs):
+        cache[pointKey(scenario, p)] = plots
+
+    if cachefile and torun:
+        with open(cachefile, "wb") as f:    # file object used so numpy does not add .npz to the filename
+            np.savez(f, **cache)            # saves every point including the new ones
+
+    dtype = [("vaccinated_perc", float), ("quarantine_lvl", float), ("lockdown_intensity", float), ("plots", np.int64, (5, timesteps + 1))]
+    results = np.zeros((len(vaccinated), len(quarantine), len(lockdown)), dtype=dtype)
+    for index, point in zip(itertools.product(range(len(vaccinated)), range(len(quarantine)), range(len(lockdown))), points):
+        results[index] = tuple(np.nan if v is None else v for v in point) + (cache[pointKey(scenario, point)],)
+    return results
+
+
+def findPoint(results, vaccinated_perc, quarantine_lvl=None, lockdown_intensity=None):
+    # returns the plots of the sweep point with the given parameter values, None finds the point with that measure turned off
+    match = np.ones(results.shape, dtype=bool)
+    for field, value in zip(("vaccinated_perc", "quarantine_lvl", "lockdown_intensity"), (vaccinated_perc, quarantine_lvl, lockdown_intensity)):
+        match &= np.isnan(results[field]) if value is None else np.isclose(results[field], value)
+    found = results[match]
+    if found.size == 0:
+        raise KeyError("No sweep point with those parameters")
+    return found[0]["plots"]
+
+
+if __name__ == "__main__":
+    # runs an example sweep when 'sweep.py' is ran by itself
+    country = gb.Country(["Country", "Null", "None", 10000, 100, 10])
+    disease = gb.Disease(["COVID-19", 2.8, 0.006, 5, 9, 1, 0, "No Information", "No Information"])
+    results = runSweep(country, disease, 100, vaccinated=(0, 0.5), quarantine=(None, 0.3), lockdown=(None, 0.1), engine="array")
+    for point in results.flat:
+        print(point["vaccinated_perc"], point["quarantine_lvl"], point["lockdown_intensity"], "total deaths:", point["plots"][3][-1])
@@ -0,0 +1,79 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# records trace events of the simulations, the threads that run them and the gui, written as Chrome trace event json
+# that can be opened in chrome://tracing or ui.perfetto.dev to see on a timeline where the time of each frame went
+# tracing is off until start is called, every function does nothing while it is off so the calls can be left in place
+# simulation phases are only traced for simulations with their timers on, as the timers measure them
+
+enabled = False         # true while events are recorded
+events = []             # events recorded since tracing was started
+threadnames = {}        # names of the threads events were recorded on, by thread id
+origin = 0              # time.perf_counter time tracing was started at, events are timed in microseconds from it
+
+
+def start():
+    # starts recording events, dropping any recorded before
+    global enabled, origin
+    events.clear()
+    threadnames.clear()
+    origin = time.perf_counter()
+    enabled = True
+
+
+def stop(filename):
+    # stops recording events and writes them to a json file, returns the number of events written
+    global enabled
+    enabled = False
+    with open(filename, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+def addEvent(event):
+    # adds the process and thread ids to an event and records it, naming the thread the first time it is seen
+    tid = threading.get_ident()
+    if tid not in threadnames:
+        threadnames[tid] = threading.current_thread().name
+        events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": threadnames[tid]}})
+    event["pid"], event["tid"] = os.getpid(), tid
+    events.append(event)     # appending to a list is atomic, so events can be added from any thread
+
+
+def complete(name, category, start, end, **args):
+    # records an event that ran from start to end, given as time.perf_counter times
+    if enabled:
+        addEvent({"name": name, "cat": category, "ph": "X", "ts": (start - origin) * 1e6, "dur": (end - start) * 1e6, "args": args})
+
+
+def instant(name, category, **args):
+    # records an event that happened now
+    if enabled:
+        addEvent({"name": name, "cat": category, "ph": "i", "s": "t", "ts": (time.perf_counter() - origin) * 1e6, "args": args})
+
+
+@contextmanager
+def span(name, category, **args):
+    # records an event lasting as long as the with block it is used in
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        complete(name, category, start, time.perf_counter(), **args)
+
+
+def flow(name, category, flowid, end=False):
+    # records the start, or with end=True the end, of an arrow between the events it is called in, such as a timestep put
+    # in a queue on one thread and taken out on another; the start and end are matched by the flowid
+    if enabled:
+        event = {"name": name, "cat": category, "ph": "f" if end else "s", "id": flowid, "ts": (time.perf_counter() - origin) * 1e6}
+        if end:
+            event["bp"] = "e"        # the arrow ends at the event it is called in, not the next event to start
+        addEvent(event)